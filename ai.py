@@ -3,84 +3,400 @@ Gemini AI module for the FitFlow Health App.
 Generates personalized workout and dinner recommendations.
 """
 
+import contextvars
+import json
+import queue
+import random
+import threading
 import time
-import streamlit as st
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from local_backend import LocalGeminiError, LocalGeminiModel
+from prompt_budget import (
+    Prompt,
+    PromptStats,
+    count_tokens,
+    fit_to_budget,
+    group_items,
+    history_steps,
+)
+from response_cache import ResponseCache, prompt_fingerprint
+from settings import get_setting, process_wide
+from summaries import format_summary
+from tracing import end_span, start_span
+
+
+# ─── Model Configuration ─────────────────────────────────────────────
+
+DEFAULT_MODEL_NAME = "gemini-2.0-flash"
+
+
+def _model_settings() -> tuple[str, str, str, str]:
+    """Collect every setting the model depends on, as hashable values.
+
+    GEMINI_GENERATION_CONFIG may be a [table] in secrets.toml or a JSON string.
+    """
+    generation_config = get_setting("GEMINI_GENERATION_CONFIG", {})
+    if isinstance(generation_config, str):
+        generation_config = json.loads(generation_config)
+    return (
+        get_setting("GEMINI_API_KEY"),
+        get_setting("GEMINI_MODEL", DEFAULT_MODEL_NAME),
+        json.dumps(dict(generation_config), sort_keys=True),
+        get_setting("GEMINI_TRANSPORT", ""),
+    )
+
+
+@process_wide(max_entries=8)
+def _build_model(
+    api_key: str, model_name: str, generation_config: str, transport: str, system_instruction: str = ""
+):
+    """Configure the client and build the model. Re-runs only when a setting changes.
+
+    One model is kept per distinct system instruction (i.e. per prompt kind).
+    GEMINI_API_KEY = "local://" uses the offline stand-in from local_backend.
+    """
+    if (api_key or "").startswith("local://"):
+        return LocalGeminiModel(model_name, system_instruction=system_instruction)
+    genai.configure(api_key=api_key, **({"transport": transport} if transport else {}))
+    return genai.GenerativeModel(
+        model_name,
+        generation_config=json.loads(generation_config) or None,
+        **({"system_instruction": system_instruction} if system_instruction else {}),
+    )
 
 
 def _get_model():
-    """Configure and return the Gemini model."""
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    return genai.GenerativeModel("gemini-2.0-flash")
+    """Return the shared Gemini model for the current settings."""
+    return _build_model(*_model_settings())
+
+
+def _model_request(kind: str, prompt: str):
+    """Return (model, contents) for a request of this kind.
+
+    The kind's static instructions go in the model's system instruction, so
+    only the per-user prompt is sent each call. If that's turned off
+    (GEMINI_SYSTEM_INSTRUCTIONS = false) or the installed SDK doesn't
+    support it, the full prompt is sent to the plain model instead.
+    """
+    instructions = SYSTEM_INSTRUCTIONS.get(kind)
+    if not instructions:
+        return _get_model(), prompt
+    if get_setting("GEMINI_SYSTEM_INSTRUCTIONS", True, bool):
+        try:
+            return _build_model(*_model_settings(), instructions), prompt
+        except TypeError:
+            pass  # google-generativeai too old for system_instruction
+    return _get_model(), f"{instructions}\n\n{prompt}"
+
+
+# ─── Rate Limiting ───────────────────────────────────────────────────
+
+class RateLimiter:
+    """A process-wide token bucket with a fair, first-come-first-served queue.
+
+    Tokens refill at `rate_per_minute` up to `burst`. Every session takes a
+    place in line, so callers are served in arrival order. A 429 pauses the
+    whole bucket (see `penalize`) so sessions back off together instead of
+    each retrying on its own.
+    """
+
+    def __init__(self, rate_per_minute: float = 15, burst: int = 3):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _eta(self, position: int, now: float) -> float:
+        """Seconds until the caller at `position` (0 = front) gets a token."""
+        deficit = max(0.0, position + 1 - self._tokens)
+        return max(self._paused_until - now, 0.0) + deficit / self.rate
+
+    def acquire(self, on_wait=None, timeout: float | None = None) -> bool:
+        """Wait in line for a token. Returns False if `timeout` runs out first.
+
+        `on_wait(position, eta_seconds)` is called (outside the lock) about once
+        a second while waiting; position 1 means next in line.
+        """
+        ticket = object()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._queue.append(ticket)
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    self._refill(now)
+                    position = self._queue.index(ticket)
+                    if position == 0 and now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return True
+                    eta = self._eta(position, now)
+                wait = min(max(eta, 0.05), 1.0)
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                if on_wait:
+                    on_wait(position + 1, eta)
+                with self._cond:
+                    self._cond.wait(timeout=wait)
+        finally:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                self._cond.notify_all()
+
+    def penalize(self, seconds: float):
+        """Pause the bucket for everyone after a 429 from Gemini."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+    def reset(self):
+        """Refill the bucket and lift any penalty (for benchmarks and tests)."""
+        with self._cond:
+            self._tokens = float(self.burst)
+            self._updated = time.monotonic()
+            self._paused_until = 0.0
+            self._cond.notify_all()
+
+    def queue_length(self) -> int:
+        return len(self._queue)
+
+    def has_idle_capacity(self, reserve: int = 1) -> bool:
+        """True if nobody is waiting and a token is free beyond `reserve`.
+
+        Background work checks this so it only spends spare quota and leaves
+        `reserve` tokens for people clicking buttons.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            return (
+                not self._queue
+                and now >= self._paused_until
+                and self._tokens >= 1 + reserve
+            )
+
+
+@process_wide
+def get_rate_limiter() -> RateLimiter:
+    """Return the limiter shared by every session in this process."""
+    return RateLimiter(
+        rate_per_minute=get_setting("GEMINI_RPM", 15.0, float),
+        burst=get_setting("GEMINI_BURST", 3, int),
+    )
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    """True for a 429, judged by exception type or status code — not message text."""
+    if isinstance(error, (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.TooManyRequests,
+        LocalGeminiError,
+    )):
+        return True
+    return getattr(error, "code", None) == 429
+
+
+def _backoff_seconds(attempt: int, base: float = 5.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter and a 1s floor: 1 + uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(cap, base * 2 ** attempt)) + 1.0
+
+
+def _queue_status(on_status):
+    """Adapt a status callback into a RateLimiter `on_wait` callback."""
+    if on_status is None:
+        return None
+    return lambda position, eta: on_status(
+        f"⏳ Queued for Gemini — position {position}, about {eta:.0f}s"
+    )
+
+
+# Yielded by streams when a call fails partway and is retried from scratch:
+# consumers should discard the text they have so far.
+STREAM_RESTART = object()
+
+
+class StreamError(str):
+    """A markdown error message yielded in place of a Gemini response."""
+
+
+def _stream_with_retry(model, prompt, max_retries=3, on_status=None, kind=""):
+    """Stream Gemini text chunks through the shared rate limiter, backing off on 429s.
+
+    `on_status(message)` receives live "queued, position N" updates. If a
+    rate limit hits partway through a stream, yields STREAM_RESTART, waits
+    its turn again, and regenerates. Failures end the stream with a
+    markdown error message instead of raising. Each call is traced as one
+    "gemini.generate" span.
+    """
+    record = start_span("gemini.generate", kind=kind, prompt_tokens=count_tokens(prompt), retries=0)
+    parts = []
+    try:
+        for chunk in _stream_attempts(model, prompt, max_retries, on_status, record):
+            if chunk is STREAM_RESTART:
+                parts.clear()
+            else:
+                parts.append(chunk)
+            yield chunk
+    finally:
+        record["response_tokens"] = count_tokens("".join(parts))
+        end_span(record)
 
 
-def _generate_with_retry(model, prompt, max_retries=3):
-    """Call Gemini with automatic retry on 429 rate-limit errors."""
+def _stream_attempts(model, prompt, max_retries, on_status, record):
+    """The retry loop behind _stream_with_retry; notes retries and errors on `record`."""
+    limiter = get_rate_limiter()
+    queue_timeout = get_setting("GEMINI_QUEUE_TIMEOUT_SECONDS", 120.0, float)
     last_error = None
     for attempt in range(max_retries):
+        record["retries"] = attempt
+        if not limiter.acquire(on_wait=_queue_status(on_status), timeout=queue_timeout):
+            record["error"] = "QueueTimeout"
+            yield StreamError(
+                "**⚠️ Gemini is busy right now.**\n\n"
+                "Too many requests are queued. Please wait a minute and try again."
+            )
+            return
+        started = False
         try:
-            response = model.generate_content(prompt)
-            return response.text
+            for chunk in model.generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # Chunk with no text part (e.g. a finish marker)
+                if text:
+                    started = True
+                    yield text
+            record["error"] = None  # Succeeded, possibly after retries
+            return
         except Exception as e:
             last_error = e
-            error_str = str(e).lower()
-            if "429" in error_str or "rate" in error_str or "quota" in error_str:
+            record["error"] = type(e).__name__
+            if started:
+                yield STREAM_RESTART
+            if _is_rate_limit(e):
                 if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * 15  # 15s, 30s, 45s
-                    st.toast(f"⏳ Rate limited — waiting {wait_time}s before retrying...")
-                    time.sleep(wait_time)
+                    wait_time = _backoff_seconds(attempt)
+                    limiter.penalize(wait_time)
+                    if on_status:
+                        on_status(
+                            f"⏳ Rate limited — retrying in about {wait_time:.0f}s "
+                            f"(attempt {attempt + 2} of {max_retries})"
+                        )
                 else:
-                    return (
+                    yield StreamError(
                         f"**⚠️ Gemini rate limit reached after {max_retries} attempts.**\n\n"
                         f"Full error: `{e}`\n\n"
                         "The free tier allows only a few requests per minute. "
                         "Please wait about 60 seconds and try again."
                     )
+                    return
             else:
-                return f"**Error:** {e}"
-    return f"**Error after {max_retries} retries:** {last_error}"
-
-
-def build_workout_prompt(profile: dict, equipment: list[dict], history: list[dict]) -> str:
-    """Build the workout recommendation prompt."""
-    # Format equipment list
-    if equipment:
-        equip_str = "\n".join(
-            f"  - {e['name']} ({e['category']}){' — ' + e['notes'] if e.get('notes') else ''}"
-            for e in equipment
-        )
-    else:
-        equip_str = "  No equipment listed — suggest bodyweight exercises only."
-
-    # Format history
-    if history:
-        hist_str = "\n".join(
-            f"  - {h.get('workout', 'N/A')[:120]}"
-            for h in history[:7]
-        )
-    else:
-        hist_str = "  No previous workouts on record."
-
-    height_ft = profile.get("height_in", 0) // 12
-    height_remaining = profile.get("height_in", 0) % 12
-
-    prompt = f"""You are a certified personal trainer creating a personalized 45-minute workout.
-
-USER PROFILE:
-  Name: {profile.get('user_name', 'Unknown')}
-  Age: {profile.get('age', 'Unknown')}
-  Height: {height_ft}'{height_remaining}"
-  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
-  Medical notes / limitations: {profile.get('medical_notes', 'None')}
-
-AVAILABLE EQUIPMENT:
-{equip_str}
-
-RECENT PAST WORKOUTS (avoid repeating these):
-{hist_str}
+                yield StreamError(f"**Error:** {e}")
+                return
+    yield StreamError(f"**Error after {max_retries} retries:** {last_error}")
+
+
+def collect_stream(chunks) -> str:
+    """Join a stream's chunks into the final text, honoring STREAM_RESTART.
+
+    Returns a StreamError if the stream ended in an error.
+    """
+    parts = []
+    for chunk in chunks:
+        if chunk is STREAM_RESTART:
+            parts.clear()
+        else:
+            parts.append(chunk)
+    text = "".join(parts)
+    return StreamError(text) if any(isinstance(p, StreamError) for p in parts) else text
+
+
+def _generate_with_retry(model, prompt, max_retries=3, on_status=None, kind=""):
+    """Call Gemini with rate limiting and retries; return the full text."""
+    return collect_stream(_stream_with_retry(model, prompt, max_retries, on_status, kind))
+
+
+# ─── Response Cache ──────────────────────────────────────────────────
+
+@process_wide
+def get_response_cache() -> ResponseCache:
+    """Return the persistent response cache shared by every session.
+
+    GEMINI_CACHE_TTLS may override the per-kind TTLs (seconds), e.g.
+    { workout = 3600, recipe = 0 }.
+    """
+    ttls = get_setting("GEMINI_CACHE_TTLS", {})
+    if isinstance(ttls, str):
+        ttls = json.loads(ttls)
+    return ResponseCache(
+        path=get_setting("GEMINI_CACHE_PATH", ".cache/gemini_responses.sqlite3"),
+        max_entries=get_setting("GEMINI_CACHE_MAX_ENTRIES", 2000, int),
+        ttls={kind: float(ttl) for kind, ttl in dict(ttls).items()},
+    )
+
+
+def _prompt_key(kind: str, prompt: str) -> str:
+    """Fingerprint a prompt together with the model settings and instructions that shape the answer."""
+    _, model_name, generation_config, _ = _model_settings()
+    instructions = SYSTEM_INSTRUCTIONS.get(kind, "")
+    return prompt_fingerprint(kind, f"{model_name}|{generation_config}|{instructions}", prompt)
+
+
+def _cached_stream(kind: str, prompt: str, on_status=None, fresh: bool = False):
+    """Stream a response, serving identical prompts from the response cache.
+
+    With fresh=True the cache is skipped ("give me something new") and the new
+    answer replaces the cached one. Errors are never cached.
+    """
+    key = _prompt_key(kind, prompt)
+    cache = get_response_cache()
+    if not fresh:
+        cached = cache.get(key, kind)
+        if cached is not None:
+            yield cached
+            return
+    get_prompt_stats().record(kind, prompt)
+    model, contents = _model_request(kind, prompt)
+    parts = []
+    failed = False
+    for chunk in _stream_with_retry(model, contents, on_status=on_status, kind=kind):
+        if chunk is STREAM_RESTART:
+            parts.clear()
+        else:
+            parts.append(chunk)
+            failed = failed or isinstance(chunk, StreamError)
+        yield chunk
+    if not failed:
+        cache.put(key, kind, "".join(parts))
+
+
+# ─── Prompt Builders ─────────────────────────────────────────────────
+# Each builder returns a Prompt (a str) compacted to fit the token budget;
+# prompt.tokens is its local token count. The static instructions for each
+# kind live in SYSTEM_INSTRUCTIONS and are sent once per model as its system
+# instruction, so builders only produce the per-user part of the request.
+
+WORKOUT_INSTRUCTIONS = """You are a certified personal trainer creating a personalized 45-minute workout.
+The request gives the user's profile, their available equipment, and their recent past workouts.
 
 INSTRUCTIONS:
-- Design a 45-minute workout that is DIFFERENT from the recent past workouts listed above.
+- Design a 45-minute workout that is DIFFERENT from the recent past workouts listed.
 - The workout should be interesting and varied. Acceptable formats include:
     • 15 minutes each of three different workout types (e.g., strength, cardio, mobility)
     • 5-minute warm-up + 35-minute main workout + 5-minute cooldown
@@ -93,43 +409,8 @@ INSTRUCTIONS:
 
 Format the response in clean markdown with clear sections."""
 
-    return prompt
-
-
-def build_dinner_prompt(profile: dict, food_prefs: list[dict], history: list[dict]) -> str:
-    """Build the dinner recommendation prompt."""
-    # Format food preferences
-    if food_prefs:
-        pref_str = "\n".join(
-            f"  - {f['item_name']} (type: {f['preference_type']})"
-            f"{' — goal: ' + f['nutritional_goal'] if f.get('nutritional_goal') else ''}"
-            for f in food_prefs
-        )
-    else:
-        pref_str = "  No food preferences recorded."
-
-    # Format past dinners
-    if history:
-        dinner_hist = "\n".join(
-            f"  - {h.get('dinner', 'N/A')[:120]}"
-            for h in history[:7]
-        )
-    else:
-        dinner_hist = "  No previous dinner suggestions on record."
-
-    prompt = f"""You are a nutrition-savvy personal chef creating a personalized dinner suggestion.
-
-USER PROFILE:
-  Name: {profile.get('user_name', 'Unknown')}
-  Age: {profile.get('age', 'Unknown')}
-  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
-  Medical notes: {profile.get('medical_notes', 'None')}
-
-FOOD PREFERENCES & DIETARY NEEDS:
-{pref_str}
-
-RECENT PAST DINNER SUGGESTIONS (suggest something different):
-{dinner_hist}
+DINNER_INSTRUCTIONS = """You are a nutrition-savvy personal chef creating a personalized dinner suggestion.
+The request gives the user's profile, their food preferences and dietary needs, and their recent past dinner suggestions.
 
 INSTRUCTIONS:
 - Suggest ONE dinner that aligns with the user's food preferences and nutritional goals.
@@ -143,47 +424,11 @@ INSTRUCTIONS:
 
 Format the response in clean markdown."""
 
-    return prompt
-
-
-def get_workout_recommendation(profile: dict, equipment: list[dict], history: list[dict]) -> str:
-    """Generate a workout recommendation using Gemini."""
-    model = _get_model()
-    prompt = build_workout_prompt(profile, equipment, history)
-    return _generate_with_retry(model, prompt)
-
-
-def get_dinner_recommendation(profile: dict, food_prefs: list[dict], history: list[dict]) -> str:
-    """Generate a dinner recommendation using Gemini."""
-    model = _get_model()
-    prompt = build_dinner_prompt(profile, food_prefs, history)
-    return _generate_with_retry(model, prompt)
-
-
-def get_vibe_reset(profile: dict, struggles: list[str]) -> str:
-    """Generate a personalized pep talk based on what the user is struggling with."""
-    model = _get_model()
-
-    height_ft = profile.get("height_in", 0) // 12
-    height_remaining = profile.get("height_in", 0) % 12
-
-    struggles_str = "\n".join(f"  - {s}" for s in struggles)
-
-    prompt = f"""You are a supportive, down-to-earth wellness coach — not a therapist, not a
+VIBE_INSTRUCTIONS = """You are a supportive, down-to-earth wellness coach — not a therapist, not a
 motivational poster. The user is having a rough time and checked off some things
 they're struggling with today. Your job is to acknowledge what they're feeling,
 normalize it, and give them a few small, actionable things they can do RIGHT NOW
-to feel even a little bit better.
-
-USER PROFILE:
-  Name: {profile.get('user_name', 'Unknown')}
-  Age: {profile.get('age', 'Unknown')}
-  Height: {height_ft}'{height_remaining}"
-  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
-  Medical notes / limitations: {profile.get('medical_notes', 'None')}
-
-WHAT THEY'RE STRUGGLING WITH TODAY:
-{struggles_str}
+to feel even a little bit better. The request gives their profile and what they checked.
 
 INSTRUCTIONS:
 - Write 2-3 paragraphs. Not a novel.
@@ -207,21 +452,183 @@ INSTRUCTIONS:
 
 Format in clean markdown. Use bold for the action items so they stand out."""
 
-    return _generate_with_retry(model, prompt)
+SYSTEM_INSTRUCTIONS = {
+    "workout": WORKOUT_INSTRUCTIONS,
+    "dinner": DINNER_INSTRUCTIONS,
+    "vibe": VIBE_INSTRUCTIONS,
+}
 
 
-def get_recipe_details(dinner_description: str, food_prefs: list[dict]) -> str:
-    """When the user asks for the full recipe, generate it."""
-    model = _get_model()
+@process_wide
+def get_prompt_stats() -> PromptStats:
+    """Return the running token counts of prompts sent to Gemini."""
+    return PromptStats()
+
+
+def prompt_token_budget(kind: str | None = None) -> int:
+    """Max tokens per request before compaction kicks in (0 = unlimited).
+
+    With a kind, returns what's left for the per-user part once the static
+    instructions are counted.
+    """
+    budget = get_setting("GEMINI_PROMPT_TOKEN_BUDGET", 1200, int)
+    if budget and kind in SYSTEM_INSTRUCTIONS:
+        budget = max(1, budget - count_tokens(SYSTEM_INSTRUCTIONS[kind]))
+    return budget
+
+
+def _history_preview(row: dict, kind: str) -> str:
+    """A compact line describing a past workout or dinner from a history row.
+
+    Uses the structured summary saved with the row, or the first 120 chars
+    of the text for rows saved before summaries existed.
+    """
+    summary = format_summary(kind, row.get(f"{kind}_summary"))
+    text = summary or row.get(f"{kind}_preview") or row.get(kind) or "N/A"
+    return text[:120]
+
+
+def build_workout_prompt(
+    profile: dict, equipment: list[dict], history: list[dict], budget: int | None = None
+) -> Prompt:
+    """Build the per-user part of the workout recommendation request.
+
+    Over budget, it drops older history first, then equipment notes, then
+    lists equipment grouped by category.
+    """
+    history = history[:7]
+    height_ft = profile.get("height_in", 0) // 12
+    height_remaining = profile.get("height_in", 0) % 12
+
+    def render(history_rows=len(history), notes=True, grouped=False):
+        # Format equipment list
+        if not equipment:
+            equip_str = "  No equipment listed — suggest bodyweight exercises only."
+        elif grouped:
+            equip_str = group_items(equipment, "name", "category")
+        else:
+            equip_str = "\n".join(
+                f"  - {e['name']} ({e['category']}){' — ' + e['notes'] if notes and e.get('notes') else ''}"
+                for e in equipment
+            )
+
+        # Format history
+        if history[:history_rows]:
+            hist_str = "\n".join(
+                f"  - {_history_preview(h, 'workout')}"
+                for h in history[:history_rows]
+            )
+        elif history:
+            hist_str = "  (Left out to keep this request short.)"
+        else:
+            hist_str = "  No previous workouts on record."
+
+        return f"""USER PROFILE:
+  Name: {profile.get('user_name', 'Unknown')}
+  Age: {profile.get('age', 'Unknown')}
+  Height: {height_ft}'{height_remaining}"
+  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
+  Medical notes / limitations: {profile.get('medical_notes', 'None')}
+
+AVAILABLE EQUIPMENT:
+{equip_str}
+
+RECENT PAST WORKOUTS (avoid repeating these):
+{hist_str}"""
+
+    steps = [*history_steps(history), ("notes", {"notes": False}), ("group", {"grouped": True})]
+    return fit_to_budget(render, steps, prompt_token_budget("workout") if budget is None else budget)
+
+
+def build_dinner_prompt(
+    profile: dict, food_prefs: list[dict], history: list[dict], budget: int | None = None
+) -> Prompt:
+    """Build the per-user part of the dinner recommendation request.
+
+    Over budget, it drops older history first, then nutritional-goal notes,
+    then lists preferences grouped by type.
+    """
+    history = history[:7]
+
+    def render(history_rows=len(history), notes=True, grouped=False):
+        # Format food preferences
+        if not food_prefs:
+            pref_str = "  No food preferences recorded."
+        elif grouped:
+            pref_str = group_items(food_prefs, "item_name", "preference_type")
+        else:
+            pref_str = "\n".join(
+                f"  - {f['item_name']} (type: {f['preference_type']})"
+                f"{' — goal: ' + f['nutritional_goal'] if notes and f.get('nutritional_goal') else ''}"
+                for f in food_prefs
+            )
+
+        # Format past dinners
+        if history[:history_rows]:
+            dinner_hist = "\n".join(
+                f"  - {_history_preview(h, 'dinner')}"
+                for h in history[:history_rows]
+            )
+        elif history:
+            dinner_hist = "  (Left out to keep this request short.)"
+        else:
+            dinner_hist = "  No previous dinner suggestions on record."
+
+        return f"""USER PROFILE:
+  Name: {profile.get('user_name', 'Unknown')}
+  Age: {profile.get('age', 'Unknown')}
+  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
+  Medical notes: {profile.get('medical_notes', 'None')}
+
+FOOD PREFERENCES & DIETARY NEEDS:
+{pref_str}
+
+RECENT PAST DINNER SUGGESTIONS (suggest something different):
+{dinner_hist}"""
+
+    steps = [*history_steps(history), ("notes", {"notes": False}), ("group", {"grouped": True})]
+    return fit_to_budget(render, steps, prompt_token_budget("dinner") if budget is None else budget)
+
+
+def build_vibe_prompt(profile: dict, struggles: list[str], budget: int | None = None) -> Prompt:
+    """Build the per-user part of the vibe reset (pep talk) request. It's short, so never compacted."""
+    height_ft = profile.get("height_in", 0) // 12
+    height_remaining = profile.get("height_in", 0) % 12
+
+    struggles_str = "\n".join(f"  - {s}" for s in struggles)
+
+    prompt = f"""USER PROFILE:
+  Name: {profile.get('user_name', 'Unknown')}
+  Age: {profile.get('age', 'Unknown')}
+  Height: {height_ft}'{height_remaining}"
+  Weight: {profile.get('weight_lbs', 'Unknown')} lbs
+  Medical notes / limitations: {profile.get('medical_notes', 'None')}
+
+WHAT THEY'RE STRUGGLING WITH TODAY:
+{struggles_str}"""
+
+    return fit_to_budget(lambda: prompt, [], prompt_token_budget("vibe") if budget is None else budget)
 
-    if food_prefs:
-        pref_str = ", ".join(
-            f"{f['item_name']} ({f['preference_type']})" for f in food_prefs
-        )
-    else:
-        pref_str = "No specific preferences."
 
-    prompt = f"""The user wants the full recipe for this dinner:
+def build_recipe_prompt(
+    dinner_description: str, food_prefs: list[dict], budget: int | None = None
+) -> Prompt:
+    """Build the full-recipe prompt for a suggested dinner.
+
+    Over budget, preferences are listed grouped by type.
+    """
+
+    def render(grouped=False):
+        if not food_prefs:
+            pref_str = "No specific preferences."
+        elif grouped:
+            pref_str = "\n" + group_items(food_prefs, "item_name", "preference_type")
+        else:
+            pref_str = ", ".join(
+                f"{f['item_name']} ({f['preference_type']})" for f in food_prefs
+            )
+
+        return f"""The user wants the full recipe for this dinner:
 
 "{dinner_description}"
 
@@ -235,4 +642,149 @@ Please provide:
 
 Keep the tone fun and energetic — FitFlow style! Format in clean markdown."""
 
-    return _generate_with_retry(model, prompt)
+    steps = [("group", {"grouped": True})]
+    return fit_to_budget(render, steps, prompt_token_budget() if budget is None else budget)
+
+
+def recommendation_key(kind: str, profile: dict, items: list[dict], history: list[dict]) -> str:
+    """Fingerprint the inputs of a workout or dinner request.
+
+    `items` is the equipment list for workouts and food preferences for dinners.
+    The key changes whenever anything that would change the prompt changes.
+    """
+    build = build_workout_prompt if kind == "workout" else build_dinner_prompt
+    return _prompt_key(kind, build(profile, items, history))
+
+
+# ─── Streaming Generators ────────────────────────────────────────────
+# Each yields text chunks as Gemini produces them (and STREAM_RESTART if a
+# retry starts over). The get_* functions below return the full text.
+
+def stream_workout_recommendation(
+    profile: dict, equipment: list[dict], history: list[dict], on_status=None, fresh=False
+):
+    """Stream a workout recommendation from Gemini."""
+    prompt = build_workout_prompt(profile, equipment, history)
+    yield from _cached_stream("workout", prompt, on_status, fresh)
+
+
+def stream_dinner_recommendation(
+    profile: dict, food_prefs: list[dict], history: list[dict], on_status=None, fresh=False
+):
+    """Stream a dinner recommendation from Gemini."""
+    prompt = build_dinner_prompt(profile, food_prefs, history)
+    yield from _cached_stream("dinner", prompt, on_status, fresh)
+
+
+def stream_vibe_reset(profile: dict, struggles: list[str], on_status=None, fresh=False):
+    """Stream a personalized pep talk based on what the user is struggling with."""
+    prompt = build_vibe_prompt(profile, struggles)
+    yield from _cached_stream("vibe", prompt, on_status, fresh)
+
+
+def stream_recipe_details(
+    dinner_description: str, food_prefs: list[dict], on_status=None, fresh=False
+):
+    """Stream the full recipe for a suggested dinner."""
+    prompt = build_recipe_prompt(dinner_description, food_prefs)
+    yield from _cached_stream("recipe", prompt, on_status, fresh)
+
+
+# ─── Full-Text Generators ────────────────────────────────────────────
+
+def get_workout_recommendation(
+    profile: dict, equipment: list[dict], history: list[dict], on_status=None, fresh=False
+) -> str:
+    """Generate a workout recommendation using Gemini."""
+    return collect_stream(
+        stream_workout_recommendation(profile, equipment, history, on_status, fresh)
+    )
+
+
+def get_dinner_recommendation(
+    profile: dict, food_prefs: list[dict], history: list[dict], on_status=None, fresh=False
+) -> str:
+    """Generate a dinner recommendation using Gemini."""
+    return collect_stream(
+        stream_dinner_recommendation(profile, food_prefs, history, on_status, fresh)
+    )
+
+
+def get_vibe_reset(profile: dict, struggles: list[str], on_status=None, fresh=False) -> str:
+    """Generate a personalized pep talk based on what the user is struggling with."""
+    return collect_stream(stream_vibe_reset(profile, struggles, on_status, fresh))
+
+
+def get_recipe_details(
+    dinner_description: str, food_prefs: list[dict], on_status=None, fresh=False
+) -> str:
+    """When the user asks for the full recipe, generate it."""
+    return collect_stream(stream_recipe_details(dinner_description, food_prefs, on_status, fresh))
+
+
+# ─── Concurrent Generation ───────────────────────────────────────────
+
+class _StatusUpdate(str):
+    """A queue/retry message from a generate_my_day worker, for the caller's on_status."""
+
+
+def generate_my_day(
+    profile: dict,
+    equipment: list[dict],
+    food_prefs: list[dict],
+    history: list[dict],
+    struggles: list[str] | None = None,
+    on_status=None,
+    fresh: bool = False,
+):
+    """Stream the workout, dinner, and (if struggles are given) vibe reset at once.
+
+    Yields (kind, chunk) pairs — kind is "workout", "dinner", or "vibe" — as
+    text arrives from all calls in parallel, so wall time is roughly the
+    slowest call, not the sum. A chunk may be STREAM_RESTART (see above).
+    `on_status` is only called from the caller's thread, never from a worker.
+    """
+    streams = {
+        "workout": lambda cb: stream_workout_recommendation(profile, equipment, history, cb, fresh),
+        "dinner": lambda cb: stream_dinner_recommendation(profile, food_prefs, history, cb, fresh),
+    }
+    if struggles:
+        streams["vibe"] = lambda cb: stream_vibe_reset(profile, struggles, cb, fresh)
+
+    events = queue.Queue()  # (kind, chunk) and (kind, _StatusUpdate) from the workers
+    stopped = threading.Event()
+    done = object()
+
+    def run(kind, make_stream):
+        try:
+            for chunk in make_stream(lambda msg: events.put((kind, _StatusUpdate(msg)))):
+                if stopped.is_set():
+                    break  # The caller stopped listening
+                events.put((kind, chunk))
+        except Exception as e:
+            events.put((kind, f"**Error:** {e}"))
+        finally:
+            events.put((kind, done))
+
+    pool = ThreadPoolExecutor(max_workers=len(streams), thread_name_prefix="fitflow-gemini")
+    try:
+        for kind, make_stream in streams.items():
+            # Run in a copy of this context so the workers' spans count toward this rerun
+            pool.submit(contextvars.copy_context().run, run, kind, make_stream)
+        statuses = {}
+        remaining = len(streams)
+        while remaining:
+            kind, chunk = events.get()
+            if chunk is done:
+                remaining -= 1
+            elif isinstance(chunk, _StatusUpdate):
+                statuses[kind] = chunk
+                if on_status:
+                    on_status(" · ".join(f"{k}: {msg}" for k, msg in statuses.items()))
+            else:
+                statuses.pop(kind, None)
+                yield kind, chunk
+    finally:
+        # If the consumer stopped early, don't wait for calls nobody will read
+        stopped.set()
+        pool.shutdown(wait=False, cancel_futures=True)
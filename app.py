@@ -4,23 +4,44 @@ FitFlow — Health & Workout Recommendation App
 A personalized health app powered by Gemini AI, Supabase, and Streamlit.
 """
 
+import functools
+from contextlib import contextmanager
+
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 from db import (
-    get_all_user_names,
-    get_physical_profile,
+    DEFAULT_USERS,
+    seed_default_users,
+    get_user_bundle,
+    user_is_configured,
     upsert_physical_profile,
     rename_user,
+    is_unique_violation,
     update_weight,
-    get_equipment,
     add_equipment,
-    delete_equipment,
-    get_food_preferences,
+    add_equipment_items,
+    delete_equipment_items,
     add_food_preference,
-    delete_food_preference,
-    get_recommendation_history,
+    add_food_preferences,
+    delete_food_preferences,
+    write_in_background,
     save_recommendation,
+    read_cache_stats,
+)
+from ai import (
+    STREAM_RESTART,
+    stream_workout_recommendation,
+    stream_dinner_recommendation,
+    stream_recipe_details,
+    stream_vibe_reset,
+    generate_my_day,
+    get_response_cache,
 )
-from ai import get_workout_recommendation, get_dinner_recommendation, get_recipe_details, get_vibe_reset
+from bulk_import import bulk_text, one_of, parse_rows
+from prefetch import get_prefetcher, take_prefetched
+from settings import get_setting
+from similarity import repeat_score, similarity_threshold
+from tracing import collect_spans, current_span, span, summarize_spans
 
 
 # ─── Page Config ──────────────────────────────────────────────────────
@@ -91,6 +112,12 @@ STRUGGLE_OPTIONS = [
 ]
 
 
+# ─── Equipment Categories & Food Preference Types ────────────────────
+
+EQUIPMENT_CATEGORIES = ["strength", "cardio", "mobility", "other"]
+PREFERENCE_TYPES = ["staple", "like", "dislike", "avoid", "allergy"]
+
+
 DEFAULT_AVATAR = {
     "emoji": "🌟",
     "label": "Star",
@@ -286,32 +313,33 @@ st.markdown(
         color: white !important;
     }
 
-    /* ── Tabs: big, bold, gradient when active ── */
-    .stTabs [data-baseweb="tab-list"] {
+    /* ── View switcher: radio buttons styled as big, bold tabs ── */
+    .stRadio [role="radiogroup"] {
         gap: 6px;
         background: #F3F4F6;
         border-radius: 16px;
         padding: 6px;
     }
-    .stTabs [data-baseweb="tab"] {
+    .stRadio label[data-baseweb="radio"] {
         border-radius: 12px;
         padding: 14px 28px;
+        margin: 0;
         font-weight: 800;
         font-size: 1.05rem;
         letter-spacing: 0.01em;
         transition: all 0.3s ease;
     }
-    .stTabs [data-baseweb="tab"]:hover {
+    .stRadio label[data-baseweb="radio"] > div:first-child {
+        display: none;
+    }
+    .stRadio label[data-baseweb="radio"]:hover {
         background: rgba(255, 107, 107, 0.08);
     }
-    .stTabs [aria-selected="true"] {
+    .stRadio label[data-baseweb="radio"]:has(input:checked) {
         background: linear-gradient(135deg, #FF6B6B, #FF8E53) !important;
-        color: white !important;
         box-shadow: 0 4px 15px rgba(255, 107, 107, 0.35);
     }
-    .stTabs [aria-selected="true"] *,
-    .stTabs [aria-selected="true"] p,
-    .stTabs [aria-selected="true"] span {
+    .stRadio label[data-baseweb="radio"]:has(input:checked) * {
         color: white !important;
     }
 
@@ -391,7 +419,7 @@ st.markdown(
 
 # ─── Initialize Session State ────────────────────────────────────────
 
-DEFAULT_USERS = ["Ashley", "User A", "User B", "User C", "User D"]
+NO_SELECTION = "— Select your profile —"
 
 if "selected_user" not in st.session_state:
     st.session_state.selected_user = None
@@ -401,49 +429,254 @@ if "last_workout" not in st.session_state:
     st.session_state.last_workout = None
 if "last_dinner" not in st.session_state:
     st.session_state.last_dinner = None
-if "eq_form_key" not in st.session_state:
-    st.session_state.eq_form_key = 0
-if "food_form_key" not in st.session_state:
-    st.session_state.food_form_key = 0
 if "last_vibe_reset" not in st.session_state:
     st.session_state.last_vibe_reset = None
+if "pending_deletes" not in st.session_state:
+    st.session_state.pending_deletes = {}  # (kind, row id) -> (Future, label)
 
 
-# ─── Ensure Default Users Exist in DB ────────────────────────────────
+# ─── Tracing: collect this rerun's db and Gemini spans ───────────────
 
-def ensure_default_users():
-    """Make sure the five default user slots exist in physical_profile."""
-    existing = get_all_user_names()
-    for u in DEFAULT_USERS:
-        if u not in existing:
-            upsert_physical_profile(
-                user_name=u,
-                age=0,
-                height_in=0,
-                weight_lbs=0,
-                medical_notes="",
-            )
+rerun_spans = collect_spans()
+
+
+# ─── Ensure Default Users Exist in DB (once per process) ─────────────
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_database() -> bool:
+    """Seed the default user slots. Cached, so it only re-runs after a failure."""
+    seed_default_users()
+    return True
+
+
+bootstrap_database()
+get_prefetcher()  # Starts the background recommendation prefetcher once per process
+
+
+# ─── Helper: Live Gemini queue status ────────────────────────────────
+
+@contextmanager
+def gemini_status():
+    """Yield an on_status callback that shows Gemini queue/retry updates in place."""
+    placeholder = st.empty()
+    try:
+        yield placeholder.caption
+    finally:
+        placeholder.empty()
+
+
+# ─── Helper: Render streamed Gemini text ─────────────────────────────
+
+def append_chunk(text: str, chunk) -> str:
+    """Add a streamed chunk to the text so far (a restart clears it)."""
+    return "" if chunk is STREAM_RESTART else text + chunk
+
+
+def render_stream(chunks, slot, waiting_message: str) -> str:
+    """Render streamed text into `slot` as it arrives and return the final text."""
+    slot.caption(waiting_message)
+    text = ""
+    for chunk in chunks:
+        text = append_chunk(text, chunk)
+        slot.markdown(text + " ▌")
+    slot.markdown(text)
+    return text
+
+
+def repeat_hint(user_name: str, kind: str, text: str, history: list[dict]):
+    """Flag a result that's too similar to one in the user's history (checked locally)."""
+    score = repeat_score(user_name, kind, text, history)
+    if score >= similarity_threshold():
+        st.caption(
+            f"🔁 This is {score:.0%} similar to one you've had recently — "
+            "try **✨ Give me something new**."
+        )
 
 
-ensure_default_users()
+# ─── Helper: Struggles checked on the Struggle Bus tab ───────────────
 
+def checked_struggles() -> list[str]:
+    """Gather the struggles the user checked, including any "Other" text."""
+    struggle_items = [
+        item for item in STRUGGLE_OPTIONS if st.session_state.get(f"struggle_{item}", False)
+    ]
+    other_text = st.session_state.get("struggle_other_text", "").strip()
+    if st.session_state.get("struggle_Other", False) and other_text:
+        struggle_items.append(other_text)
+    return struggle_items
 
-# ─── Helper: Check if user is set up ─────────────────────────────────
 
-def user_is_configured(profile: dict | None) -> bool:
-    """A user is configured if they have height, weight, and age filled in."""
-    if not profile:
+# Session-state key holding the latest result for each kind of recommendation
+RESULT_KEYS = {"workout": "last_workout", "dinner": "last_dinner", "vibe": "last_vibe_reset"}
+
+
+# ─── Helper: Optimistic deletes ──────────────────────────────────────
+
+# How often a page with deletes in flight checks whether any failed
+DELETE_POLL_SECONDS = 2.0
+
+DELETE_FUNCTIONS = {
+    "equipment": delete_equipment_items,
+    "food_preferences": delete_food_preferences,
+}
+
+
+def queue_delete(kind: str, rows: list[dict], label_key: str):
+    """Button callback: hide `rows` right away and delete them in the background."""
+    future = write_in_background(DELETE_FUNCTIONS[kind], [row["id"] for row in rows])
+    for row in rows:
+        st.session_state.pending_deletes[(kind, row["id"])] = (future, row[label_key])
+
+
+def settle_failed_deletes(kind: str):
+    """Toast and forget finished deletes of `kind` that failed."""
+    pending = st.session_state.pending_deletes
+    for key, (future, label) in list(pending.items()):
+        if key[0] == kind and future.done() and future.exception() is not None:
+            del pending[key]
+            st.toast(f"Couldn't remove **{label}** — it's back in your list.", icon="⚠️")
+
+
+def visible_rows(kind: str, rows: list[dict]) -> list[dict]:
+    """Drop rows with a delete in flight; bring back (with a toast) any whose delete failed."""
+    settle_failed_deletes(kind)
+    pending = st.session_state.pending_deletes
+    present = {row["id"] for row in rows}
+    for key, (future, _) in list(pending.items()):
+        if key[0] == kind and future.done() and key[1] not in present:
+            del pending[key]  # Deleted, and the list we loaded no longer has it
+    return [row for row in rows if (kind, row["id"]) not in pending]
+
+
+@st.fragment(run_every=DELETE_POLL_SECONDS)
+def delete_watcher(kind: str):
+    """Poll a list's deletes in flight, so a failure shows without waiting for a click.
+
+    Lists draw it only while they have deletes pending. Once one fails or
+    all have finished, it reruns the app: visible_rows brings back the
+    failed rows with a toast, and the list is redrawn without the watcher,
+    which ends the polling. A plain st.fragment: its polls aren't traced,
+    so they don't replace the admin panel's numbers every few seconds.
+    """
+    futures = [future for (k, _), (future, _) in st.session_state.pending_deletes.items() if k == kind]
+    if all(f.done() for f in futures) or any(f.done() and f.exception() for f in futures):
+        st.rerun()
+
+
+def watch_deletes(kind: str):
+    """Draw delete_watcher for `kind` while any of its deletes are in flight."""
+    if any(k == kind for k, _ in st.session_state.pending_deletes):
+        delete_watcher(kind)
+
+
+# ─── Helper: Fragments — regions that rerun on their own ─────────────
+
+def fragment_rerun() -> bool:
+    """True while Streamlit is rerunning only fragments, not the whole script."""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def fragment(fn):
+    """st.fragment, with each run of the region traced as a "fragment.<name>" span.
+
+    A widget inside a fragment reruns only that fragment, so a click costs
+    just the data the region loads. The span lets benchmark.py count that.
+    On a fragment-only rerun, the outermost fragment starts a fresh span list
+    and refreshes the admin panel, so it shows just that rerun's calls.
+    """
+    @functools.wraps(fn)
+    def region(*args, **kwargs):
+        global rerun_spans
+        outermost = fragment_rerun() and current_span() is None
+        if outermost:
+            rerun_spans = collect_spans()
+        with span(f"fragment.{fn.__name__}"):
+            result = fn(*args, **kwargs)
+        if outermost:
+            render_admin_panel()
+        return result
+    return st.fragment(region)
+
+
+def keep_view_widgets():
+    """Carry over the values of widgets in views that aren't showing.
+
+    Streamlit forgets a widget's value on any run that doesn't draw it, and
+    only the active view is drawn.
+    """
+    for key in [f"struggle_{item}" for item in STRUGGLE_OPTIONS] + [
+        "struggle_Other", "struggle_other_text", "fresh_recommendations",
+    ]:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+
+# ─── Helper: Rename without crashing on a taken name ─────────────────
+
+def try_rename_user(old_name: str, new_name: str) -> bool:
+    """Rename a user, showing an error (and renaming nothing) if it fails."""
+    try:
+        rename_user(old_name, new_name)
+        return True
+    except Exception as e:
+        if is_unique_violation(e):
+            st.error(f"Couldn't rename to **{new_name}** — that name is already taken.")
+        else:
+            st.error(f"Couldn't rename to **{new_name}**: {str(e).splitlines()[0]}")
         return False
-    return all([
-        profile.get("height_in", 0) > 0,
-        profile.get("weight_lbs", 0) > 0,
-        profile.get("age", 0) > 0,
-    ])
 
 
-# ─── Get current state ───────────────────────────────────────────────
+# ─── Helper: Admin panel with this rerun's trace totals ──────────────
+
+def render_admin_panel():
+    """Show this rerun's db and Gemini call totals, plus cache hit rates, in the sidebar (TRACE_ADMIN_PANEL)."""
+    if admin_slot is None:
+        return
+    totals = summarize_spans(rerun_spans)
+    with admin_slot.container():
+        with st.expander("🛠️ This rerun"):
+            if totals:
+                calls = sum(t["calls"] for t in totals)
+                ms = sum(t["ms"] for t in totals)
+                errors = sum(t["errors"] for t in totals)
+                st.caption(f"{calls} calls · {ms:.0f} ms · {errors} errors")
+                st.dataframe(totals, hide_index=True, use_container_width=True)
+            else:
+                st.caption("No db or Gemini calls this rerun.")
+        with st.expander("📦 Caches (this process)"):
+            st.dataframe(
+                [
+                    {"cache": "db reads", **read_cache_stats()},
+                    {"cache": "Gemini responses", **get_response_cache().stats()},
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+            prefetcher = get_prefetcher()
+            if prefetcher:
+                p = prefetcher.stats()
+                st.caption(
+                    f"Prefetch: {p['buffered']} ready · {p['served']} served · "
+                    f"{p['generated']} generated · {p['discarded']} discarded"
+                )
+
 
-all_users = get_all_user_names()
+# ─── Get current state (one round trip per render) ───────────────────
+
+def load_bundle(user_name: str | None) -> dict:
+    """Load the user list plus the chosen user's profile for this render.
+
+    Each view loads the rest of the data it shows itself (see Views below).
+    """
+    user_name = None if user_name in (None, NO_SELECTION) else user_name
+    return get_user_bundle(user_name, parts=("user_names", "profile"))
+
+
+bundle_user = st.session_state.get("user_dropdown", NO_SELECTION)
+bundle = load_bundle(bundle_user)
+
+all_users = bundle["user_names"]
 display_users = list(dict.fromkeys(DEFAULT_USERS + all_users))
 
 
@@ -463,15 +696,20 @@ with st.sidebar:
 
     selected = st.selectbox(
         "Who are you?",
-        options=["— Select your profile —"] + display_users,
+        options=[NO_SELECTION] + display_users,
         index=0,
         key="user_dropdown",
         label_visibility="collapsed",
     )
     st.session_state.selected_user = selected
 
+    # The dropdown can fall back to another option (e.g. after a rename)
+    if selected != bundle_user:
+        bundle_user = selected
+        bundle = load_bundle(bundle_user)
+
     # Show profile details in sidebar if user is configured
-    profile = get_physical_profile(selected) if selected != "— Select your profile —" else None
+    profile = bundle["profile"]
     if profile and user_is_configured(profile):
         st.divider()
         avatar = get_avatar(selected)
@@ -509,6 +747,8 @@ with st.sidebar:
                 unsafe_allow_html=True,
             )
 
+    admin_slot = st.empty() if get_setting("TRACE_ADMIN_PANEL", False, bool) else None
+
     st.divider()
     st.markdown(
         "<p style='font-size:0.7rem; text-align:center; opacity:0.35;'>"
@@ -518,13 +758,449 @@ with st.sidebar:
     )
 
 
+# ─── Views — one per tab of the configured-user page ─────────────────
+# Each view is a fragment that loads only the data it shows, so picking a
+# view or clicking inside one doesn't query for the others. The busiest
+# regions inside them (the recipe button, the equipment and food lists)
+# are fragments too. Anything that changes the sidebar (a rename) still
+# reruns the whole app.
+
+def user_data(profile: dict, *parts: str) -> dict:
+    """Load just these parts of the profile owner's data (cached per part)."""
+    return get_user_bundle(profile["user_name"], parts=parts)
+
+
+@fragment
+def recipe_panel(dinner: str, food_prefs: list[dict]):
+    """The recipe button, which reruns only this panel."""
+    if st.button("📜 Yes, give me the recipe!"):
+        recipe_slot = st.empty()
+        with gemini_status() as on_status:
+            render_stream(
+                stream_recipe_details(dinner, food_prefs, on_status),
+                recipe_slot,
+                "Writing up the recipe...",
+            )
+
+
+@fragment
+def equipment_list(profile: dict):
+    """The user's equipment; a delete reruns only this list."""
+    equipment = visible_rows("equipment", user_data(profile, "equipment")["equipment"])
+    watch_deletes("equipment")
+
+    if equipment:
+        st.divider()
+        st.markdown("#### 📋 Your Equipment")
+        for item in equipment:
+            ecol1, ecol2, ecol3 = st.columns([3, 2, 1])
+            with ecol1:
+                st.write(f"**{item['name']}**")
+            with ecol2:
+                st.caption(item.get("category", ""))
+            with ecol3:
+                st.button(
+                    "🗑️",
+                    key=f"del_eq_{item['id']}",
+                    on_click=queue_delete,
+                    args=("equipment", [item], "name"),
+                )
+            if item.get("notes"):
+                st.caption(f"  _{item['notes']}_")
+
+        with st.expander("🗑️ Remove several"):
+            eq_names = {item["id"]: item["name"] for item in equipment}
+            eq_remove = st.multiselect(
+                "Equipment to remove", list(eq_names), format_func=eq_names.get
+            )
+            st.button(
+                "Remove selected equipment",
+                disabled=not eq_remove,
+                on_click=queue_delete,
+                args=("equipment", [i for i in equipment if i["id"] in eq_remove], "name"),
+            )
+
+
+@fragment
+def food_preferences_list(profile: dict):
+    """The user's food preferences; a delete reruns only this list."""
+    rows = user_data(profile, "food_preferences")["food_preferences"]
+    food_prefs = visible_rows("food_preferences", rows)
+    watch_deletes("food_preferences")
+
+    if food_prefs:
+        st.divider()
+        st.markdown("#### 📋 Your Preferences")
+        for fp in food_prefs:
+            fcol1, fcol2, fcol3 = st.columns([3, 2, 1])
+            with fcol1:
+                st.write(f"**{fp['item_name']}**")
+            with fcol2:
+                badge_colors = {
+                    "staple": "🟢", "avoid": "🔴", "allergy": "⛔",
+                    "like": "👍", "dislike": "👎",
+                }
+                icon = badge_colors.get(fp.get("preference_type", ""), "⚪")
+                st.caption(f"{icon} {fp.get('preference_type', '')}")
+            with fcol3:
+                st.button(
+                    "🗑️",
+                    key=f"del_fp_{fp['id']}",
+                    on_click=queue_delete,
+                    args=("food_preferences", [fp], "item_name"),
+                )
+            if fp.get("nutritional_goal"):
+                st.caption(f"  _Goal: {fp['nutritional_goal']}_")
+
+        with st.expander("🗑️ Remove several"):
+            fp_names = {fp["id"]: fp["item_name"] for fp in food_prefs}
+            fp_remove = st.multiselect(
+                "Preferences to remove", list(fp_names), format_func=fp_names.get
+            )
+            st.button(
+                "Remove selected preferences",
+                disabled=not fp_remove,
+                on_click=queue_delete,
+                args=("food_preferences", [f for f in food_prefs if f["id"] in fp_remove], "item_name"),
+            )
+
+
+@fragment
+def recommendations_view(profile: dict):
+    st.markdown("### 💡 Today's Recommendations")
+
+    data = user_data(profile, "equipment", "food_preferences", "history")
+    equipment = visible_rows("equipment", data["equipment"])
+    food_prefs = visible_rows("food_preferences", data["food_preferences"])
+    history = data["history"]
+
+    generate_day = st.button(
+        "⚡ Generate my day",
+        use_container_width=True,
+        help="Workout, dinner, and (if you've checked any struggles) a vibe reset — all at once.",
+    )
+    day_struggles = checked_struggles() if generate_day else []
+    fresh = st.toggle(
+        "✨ Give me something new",
+        key="fresh_recommendations",
+        help="Skip saved answers for identical requests and ask Gemini for a fresh take.",
+    )
+
+    rcol1, rcol2, rcol3 = st.columns(3)
+
+    with rcol1:
+        st.markdown("#### 🏋️ Workout")
+        workout_clicked = st.button("🎲 Generate Workout", use_container_width=True)
+        workout_slot = st.empty()
+        ready = None
+        if workout_clicked:
+            ready = take_prefetched(profile["user_name"], "workout", profile, equipment, history)
+        if ready:
+            st.session_state.last_workout = ready
+            workout_slot.markdown(ready)
+        elif workout_clicked:
+            with gemini_status() as on_status:
+                st.session_state.last_workout = render_stream(
+                    stream_workout_recommendation(profile, equipment, history, on_status, fresh),
+                    workout_slot,
+                    "Building your workout...",
+                )
+            repeat_hint(profile["user_name"], "workout", st.session_state.last_workout, history)
+        elif st.session_state.last_workout and not generate_day:
+            workout_slot.markdown(st.session_state.last_workout)
+
+    with rcol2:
+        st.markdown("#### 🍽️ Dinner")
+        dinner_clicked = st.button("🎲 Generate Dinner Idea", use_container_width=True)
+        dinner_slot = st.empty()
+        ready = None
+        if dinner_clicked:
+            ready = take_prefetched(profile["user_name"], "dinner", profile, food_prefs, history)
+        if ready:
+            st.session_state.last_dinner = ready
+            dinner_slot.markdown(ready)
+        elif dinner_clicked:
+            with gemini_status() as on_status:
+                st.session_state.last_dinner = render_stream(
+                    stream_dinner_recommendation(profile, food_prefs, history, on_status, fresh),
+                    dinner_slot,
+                    "Cooking up ideas...",
+                )
+            repeat_hint(profile["user_name"], "dinner", st.session_state.last_dinner, history)
+        elif st.session_state.last_dinner and not generate_day:
+            dinner_slot.markdown(st.session_state.last_dinner)
+
+        if st.session_state.last_dinner and not generate_day:
+            recipe_panel(st.session_state.last_dinner, food_prefs)
+
+    with rcol3:
+        st.markdown("#### 🫂 Vibe Check")
+        vibe_clicked = st.button("🔄 Reset My Vibe", use_container_width=True)
+        vibe_slot = st.empty()
+        struggle_items = checked_struggles() if vibe_clicked else []
+        if vibe_clicked and not struggle_items:
+            st.warning("Head over to the **🚌 Struggle Bus** tab first and check off what's weighing on you today.")
+        elif vibe_clicked:
+            with gemini_status() as on_status:
+                st.session_state.last_vibe_reset = render_stream(
+                    stream_vibe_reset(profile, struggle_items, on_status, fresh),
+                    vibe_slot,
+                    "Resetting your vibe...",
+                )
+        if st.session_state.last_vibe_reset and not vibe_clicked and not (generate_day and day_struggles):
+            vibe_slot.markdown(st.session_state.last_vibe_reset)
+
+    # Generate my day: fill each panel as its result arrives
+    if generate_day:
+        slots = {"workout": workout_slot, "dinner": dinner_slot}
+        if day_struggles:
+            slots["vibe"] = vibe_slot
+        texts = {kind: "" for kind in slots}
+        for slot in slots.values():
+            slot.caption("⏳ Working on it...")
+        with gemini_status() as on_status:
+            for kind, chunk in generate_my_day(
+                profile, equipment, food_prefs, history, day_struggles,
+                on_status=on_status, fresh=fresh,
+            ):
+                texts[kind] = append_chunk(texts[kind], chunk)
+                slots[kind].markdown(texts[kind] + " ▌")
+        for kind, text in texts.items():
+            slots[kind].markdown(text)
+            st.session_state[RESULT_KEYS[kind]] = text
+
+    # Save both if generated
+    if st.session_state.last_workout and st.session_state.last_dinner:
+        if st.button("💾 Save today's recommendations to history"):
+            save_recommendation(
+                profile["user_name"],
+                st.session_state.last_workout,
+                st.session_state.last_dinner,
+            )
+            st.success("Saved to your history!")
+
+
+@fragment
+def equipment_view(profile: dict):
+    st.markdown("### 🔧 My Equipment")
+    st.caption("Tell us what you have available so we can tailor workouts.")
+
+    # ── Add form FIRST ──
+    st.markdown("#### ➕ Add Equipment")
+    with st.form("add_equipment_form", clear_on_submit=True):
+        eq_name = st.text_input("Equipment Name", placeholder="e.g., Kettlebell")
+        eq_category = st.selectbox(
+            "Category",
+            EQUIPMENT_CATEGORIES,
+        )
+        eq_notes = st.text_input("Notes (optional)", placeholder="e.g., 16kg single")
+        eq_submit = st.form_submit_button("Add Equipment")
+
+        if eq_submit and eq_name.strip():
+            add_equipment(profile["user_name"], eq_name.strip(), eq_category, eq_notes)
+            st.success(f"Added **{eq_name.strip()}**!")
+
+    # ── Or many at once (one insert, one rerun) ──
+    with st.expander("📋 Add several at once"):
+        with st.form("bulk_equipment_form", clear_on_submit=True):
+            eq_bulk_text = st.text_area(
+                "One per line: name, category, notes",
+                placeholder="Kettlebell, strength, 16kg single\nJump rope, cardio\nFoam roller, mobility",
+            )
+            eq_bulk_file = st.file_uploader(
+                "…or upload a CSV with columns name, category, notes", type="csv"
+            )
+            eq_bulk_submit = st.form_submit_button("Add All Equipment")
+
+            if eq_bulk_submit:
+                items = parse_rows(
+                    bulk_text(eq_bulk_text, eq_bulk_file), ("name", "category", "notes")
+                )
+                for item in items:
+                    item["category"] = one_of(item["category"], EQUIPMENT_CATEGORIES, "other")
+                if items:
+                    add_equipment_items(profile["user_name"], items)
+                    st.success(f"Added {len(items)} items!")
+                else:
+                    st.warning("Nothing to add — enter one item per line.")
+
+    # ── Existing equipment list below ──
+    equipment_list(profile)
+
+
+@fragment
+def food_preferences_view(profile: dict):
+    st.markdown("### 🍽️ Food Preferences")
+    st.caption("Help us suggest meals you'll actually enjoy.")
+
+    # ── Add form FIRST ──
+    st.markdown("#### ➕ Add Food Preference")
+    with st.form("add_food_form", clear_on_submit=True):
+        fp_item = st.text_input(
+            "Food Item or Category",
+            placeholder="e.g., High Protein, Shellfish, Mexican food",
+        )
+        fp_type = st.selectbox(
+            "Preference Type",
+            PREFERENCE_TYPES,
+        )
+        fp_goal = st.text_input(
+            "Nutritional Goal (optional)",
+            placeholder="e.g., Support muscle recovery",
+        )
+        fp_submit = st.form_submit_button("Add Preference")
+
+        if fp_submit and fp_item.strip():
+            add_food_preference(
+                profile["user_name"], fp_item.strip(), fp_type, fp_goal
+            )
+            st.success(f"Added **{fp_item.strip()}**!")
+
+    # ── Or many at once (one insert, one rerun) ──
+    with st.expander("📋 Add several at once"):
+        with st.form("bulk_food_form", clear_on_submit=True):
+            fp_bulk_text = st.text_area(
+                "One per line: item, type, nutritional goal",
+                placeholder="Chicken, staple, High protein\nShellfish, allergy\nMexican food, like",
+            )
+            fp_bulk_file = st.file_uploader(
+                "…or upload a CSV with columns item_name, preference_type, nutritional_goal",
+                type="csv",
+            )
+            fp_bulk_submit = st.form_submit_button("Add All Preferences")
+
+            if fp_bulk_submit:
+                prefs = parse_rows(
+                    bulk_text(fp_bulk_text, fp_bulk_file),
+                    ("item_name", "preference_type", "nutritional_goal"),
+                )
+                for pref in prefs:
+                    pref["preference_type"] = one_of(pref["preference_type"], PREFERENCE_TYPES, "like")
+                if prefs:
+                    add_food_preferences(profile["user_name"], prefs)
+                    st.success(f"Added {len(prefs)} preferences!")
+                else:
+                    st.warning("Nothing to add — enter one item per line.")
+
+    # ── Existing preferences list below ──
+    food_preferences_list(profile)
+
+
+@fragment
+def struggle_bus_view(profile: dict):
+    st.markdown("### 🚌 Struggle Bus")
+    st.markdown(
+        "Some days are harder than others — and that's okay. "
+        "Check off anything that's weighing on you today, then head back to "
+        "**Recommendations** and hit **🔄 Reset My Vibe** for a personalized pep talk."
+    )
+    st.divider()
+
+    # Two columns for a cleaner layout
+    scol1, scol2 = st.columns(2)
+    for i, item in enumerate(STRUGGLE_OPTIONS):
+        col = scol1 if i % 2 == 0 else scol2
+        with col:
+            st.checkbox(item, key=f"struggle_{item}")
+
+    # "Other" with text field
+    st.divider()
+    other_checked = st.checkbox("Other", key="struggle_Other")
+    if other_checked:
+        st.text_input(
+            "What else is on your mind?",
+            placeholder="Type here...",
+            key="struggle_other_text",
+        )
+
+
+@fragment
+def edit_profile_view(profile: dict):
+    st.markdown("### ⚙️ Edit Profile")
+
+    with st.form("edit_profile_form"):
+        edit_name = st.text_input(
+            "Profile Name",
+            value=profile["user_name"],
+        )
+        edit_age = st.number_input(
+            "Age", min_value=10, max_value=120, value=profile.get("age", 30)
+        )
+        ecol1, ecol2 = st.columns(2)
+        with ecol1:
+            edit_feet = st.number_input(
+                "Height (feet)",
+                min_value=3,
+                max_value=8,
+                value=profile["height_in"] // 12,
+            )
+        with ecol2:
+            edit_inches = st.number_input(
+                "Height (inches)",
+                min_value=0,
+                max_value=11,
+                value=profile["height_in"] % 12,
+            )
+        edit_weight = st.number_input(
+            "Weight (lbs)",
+            min_value=50,
+            max_value=600,
+            value=profile.get("weight_lbs", 150),
+        )
+        edit_medical = st.text_area(
+            "Goals & Medical Notes / Limitations",
+            value=profile.get("medical_notes", ""),
+        )
+        edit_submit = st.form_submit_button("💾 Update Profile")
+
+        if edit_submit:
+            new_height = (edit_feet * 12) + edit_inches
+            final_name = edit_name.strip() if edit_name.strip() else profile["user_name"]
+
+            upsert_physical_profile(
+                user_name=profile["user_name"],
+                age=edit_age,
+                height_in=new_height,
+                weight_lbs=edit_weight,
+                medical_notes=edit_medical,
+            )
+
+            # If name changed, rename the user in the database
+            if final_name != profile["user_name"]:
+                if try_rename_user(profile["user_name"], final_name):
+                    st.success(f"Profile updated! Name changed to **{final_name}**.")
+                    st.rerun()
+            else:
+                st.success("Profile updated!")
+                st.rerun()
+
+
+VIEWS = {
+    "🏋️ Recommendations": recommendations_view,
+    "🔧 My Equipment": equipment_view,
+    "🍽️ Food Preferences": food_preferences_view,
+    "🚌 Struggle Bus": struggle_bus_view,
+    "⚙️ Edit Profile": edit_profile_view,
+}
+
+
+@fragment
+def view_router(profile: dict):
+    """The view picker and the selected view. Switching views reruns only this."""
+    keep_view_widgets()
+    view = st.radio(
+        "View", list(VIEWS), horizontal=True, key="active_view", label_visibility="collapsed"
+    )
+    VIEWS[view](profile)
+
+
 # ─── Main Content ────────────────────────────────────────────────────
 
 user = st.session_state.selected_user
 
 # ─── HOME PAGE — No user selected yet ────────────────────────────────
 
-if user == "— Select your profile —":
+if user == NO_SELECTION:
     st.markdown("")
     st.markdown(
         "<p class='app-title'>💪 FitFlow</p>"
@@ -545,9 +1221,10 @@ if user == "— Select your profile —":
         "</div>",
         unsafe_allow_html=True,
     )
+    render_admin_panel()
     st.stop()
 
-profile = get_physical_profile(user)
+profile = bundle["profile"]
 is_placeholder = user in ["User A", "User B", "User C", "User D"]
 
 # ─── FIRST-TIME SETUP for placeholder users ──────────────────────────
@@ -591,9 +1268,9 @@ if is_placeholder and not user_is_configured(profile):
                     weight_lbs=new_weight,
                     medical_notes=new_medical,
                 )
-                rename_user(user, new_name.strip())
-                st.success(f"✅ Profile saved! Welcome, **{new_name.strip()}**!")
-                st.rerun()
+                if try_rename_user(user, new_name.strip()):
+                    st.success(f"✅ Profile saved! Welcome, **{new_name.strip()}**!")
+                    st.rerun()
 
 # ─── CONFIGURED USER VIEW ────────────────────────────────────────────
 
@@ -619,261 +1296,9 @@ elif user_is_configured(profile):
         unsafe_allow_html=True,
     )
 
-    # ─── TABS ─────────────────────────────────────────────────────────
-
-    tab_recs, tab_equip, tab_food, tab_struggle, tab_profile = st.tabs(
-        ["🏋️ Recommendations", "🔧 My Equipment", "🍽️ Food Preferences", "🚌 Struggle Bus", "⚙️ Edit Profile"]
-    )
-
-    # ── Recommendations Tab ───────────────────────────────────────────
-    with tab_recs:
-        st.markdown("### 💡 Today's Recommendations")
-
-        equipment = get_equipment(profile["user_name"])
-        food_prefs = get_food_preferences(profile["user_name"])
-        history = get_recommendation_history(profile["user_name"])
-
-        rcol1, rcol2, rcol3 = st.columns(3)
-
-        with rcol1:
-            st.markdown("#### 🏋️ Workout")
-            if st.button("🎲 Generate Workout", use_container_width=True):
-                with st.spinner("Building your workout..."):
-                    workout = get_workout_recommendation(profile, equipment, history)
-                    st.session_state.last_workout = workout
-
-            if st.session_state.last_workout:
-                st.markdown(st.session_state.last_workout)
-
-        with rcol2:
-            st.markdown("#### 🍽️ Dinner")
-            if st.button("🎲 Generate Dinner Idea", use_container_width=True):
-                with st.spinner("Cooking up ideas..."):
-                    dinner = get_dinner_recommendation(profile, food_prefs, history)
-                    st.session_state.last_dinner = dinner
-
-            if st.session_state.last_dinner:
-                st.markdown(st.session_state.last_dinner)
-
-                if st.button("📜 Yes, give me the recipe!"):
-                    with st.spinner("Writing up the recipe..."):
-                        recipe = get_recipe_details(
-                            st.session_state.last_dinner, food_prefs
-                        )
-                        st.markdown(recipe)
-
-        with rcol3:
-            st.markdown("#### 🫂 Vibe Check")
-            if st.button("🔄 Reset My Vibe", use_container_width=True):
-                # Gather checked struggles from session state
-                struggle_items = []
-                for item in STRUGGLE_OPTIONS:
-                    if st.session_state.get(f"struggle_{item}", False):
-                        struggle_items.append(item)
-                other_text = st.session_state.get("struggle_other_text", "").strip()
-                if st.session_state.get("struggle_Other", False) and other_text:
-                    struggle_items.append(other_text)
-
-                if not struggle_items:
-                    st.warning("Head over to the **🚌 Struggle Bus** tab first and check off what's weighing on you today.")
-                else:
-                    with st.spinner("Resetting your vibe..."):
-                        vibe = get_vibe_reset(profile, struggle_items)
-                        st.session_state.last_vibe_reset = vibe
-
-            if st.session_state.last_vibe_reset:
-                st.markdown(st.session_state.last_vibe_reset)
-
-        # Save both if generated
-        if st.session_state.last_workout and st.session_state.last_dinner:
-            if st.button("💾 Save today's recommendations to history"):
-                save_recommendation(
-                    profile["user_name"],
-                    st.session_state.last_workout[:500],
-                    st.session_state.last_dinner[:500],
-                )
-                st.success("Saved to your history!")
-
-    # ── Equipment Tab ─────────────────────────────────────────────────
-    with tab_equip:
-        st.markdown("### 🔧 My Equipment")
-        st.caption("Tell us what you have available so we can tailor workouts.")
-
-        # ── Add form FIRST ──
-        st.markdown("#### ➕ Add Equipment")
-        with st.form(f"add_equipment_form_{st.session_state.eq_form_key}"):
-            eq_name = st.text_input("Equipment Name", placeholder="e.g., Kettlebell")
-            eq_category = st.selectbox(
-                "Category",
-                ["strength", "cardio", "mobility", "other"],
-            )
-            eq_notes = st.text_input("Notes (optional)", placeholder="e.g., 16kg single")
-            eq_submit = st.form_submit_button("Add Equipment")
-
-            if eq_submit and eq_name.strip():
-                add_equipment(profile["user_name"], eq_name.strip(), eq_category, eq_notes)
-                st.success(f"Added **{eq_name.strip()}**!")
-                st.session_state.eq_form_key += 1
-                st.rerun()
-
-        # ── Existing equipment list below ──
-        equipment = get_equipment(profile["user_name"])
-
-        if equipment:
-            st.divider()
-            st.markdown("#### 📋 Your Equipment")
-            for item in equipment:
-                ecol1, ecol2, ecol3 = st.columns([3, 2, 1])
-                with ecol1:
-                    st.write(f"**{item['name']}**")
-                with ecol2:
-                    st.caption(item.get("category", ""))
-                with ecol3:
-                    if st.button("🗑️", key=f"del_eq_{item['id']}"):
-                        delete_equipment(item["id"])
-                        st.rerun()
-                if item.get("notes"):
-                    st.caption(f"  _{item['notes']}_")
-
-    # ── Food Preferences Tab ──────────────────────────────────────────
-    with tab_food:
-        st.markdown("### 🍽️ Food Preferences")
-        st.caption("Help us suggest meals you'll actually enjoy.")
-
-        # ── Add form FIRST ──
-        st.markdown("#### ➕ Add Food Preference")
-        with st.form(f"add_food_form_{st.session_state.food_form_key}"):
-            fp_item = st.text_input(
-                "Food Item or Category",
-                placeholder="e.g., High Protein, Shellfish, Mexican food",
-            )
-            fp_type = st.selectbox(
-                "Preference Type",
-                ["staple", "like", "dislike", "avoid", "allergy"],
-            )
-            fp_goal = st.text_input(
-                "Nutritional Goal (optional)",
-                placeholder="e.g., Support muscle recovery",
-            )
-            fp_submit = st.form_submit_button("Add Preference")
-
-            if fp_submit and fp_item.strip():
-                add_food_preference(
-                    profile["user_name"], fp_item.strip(), fp_type, fp_goal
-                )
-                st.success(f"Added **{fp_item.strip()}**!")
-                st.session_state.food_form_key += 1
-                st.rerun()
-
-        # ── Existing preferences list below ──
-        food_prefs = get_food_preferences(profile["user_name"])
-
-        if food_prefs:
-            st.divider()
-            st.markdown("#### 📋 Your Preferences")
-            for fp in food_prefs:
-                fcol1, fcol2, fcol3 = st.columns([3, 2, 1])
-                with fcol1:
-                    st.write(f"**{fp['item_name']}**")
-                with fcol2:
-                    badge_colors = {
-                        "staple": "🟢", "avoid": "🔴", "allergy": "⛔",
-                        "like": "👍", "dislike": "👎",
-                    }
-                    icon = badge_colors.get(fp.get("preference_type", ""), "⚪")
-                    st.caption(f"{icon} {fp.get('preference_type', '')}")
-                with fcol3:
-                    if st.button("🗑️", key=f"del_fp_{fp['id']}"):
-                        delete_food_preference(fp["id"])
-                        st.rerun()
-                if fp.get("nutritional_goal"):
-                    st.caption(f"  _Goal: {fp['nutritional_goal']}_")
-
-    # ── Struggle Bus Tab ──────────────────────────────────────────────
-    with tab_struggle:
-        st.markdown("### 🚌 Struggle Bus")
-        st.markdown(
-            "Some days are harder than others — and that's okay. "
-            "Check off anything that's weighing on you today, then head back to "
-            "**Recommendations** and hit **🔄 Reset My Vibe** for a personalized pep talk."
-        )
-        st.divider()
-
-        # Two columns for a cleaner layout
-        scol1, scol2 = st.columns(2)
-        for i, item in enumerate(STRUGGLE_OPTIONS):
-            col = scol1 if i % 2 == 0 else scol2
-            with col:
-                st.checkbox(item, key=f"struggle_{item}")
-
-        # "Other" with text field
-        st.divider()
-        other_checked = st.checkbox("Other", key="struggle_Other")
-        if other_checked:
-            st.text_input(
-                "What else is on your mind?",
-                placeholder="Type here...",
-                key="struggle_other_text",
-            )
+    # ─── VIEWS — only the selected one runs ─────────────────────────
 
-    # ── Edit Profile Tab ──────────────────────────────────────────────
-    with tab_profile:
-        st.markdown("### ⚙️ Edit Profile")
-
-        with st.form("edit_profile_form"):
-            edit_name = st.text_input(
-                "Profile Name",
-                value=profile.get("user_name", user),
-            )
-            edit_age = st.number_input(
-                "Age", min_value=10, max_value=120, value=profile.get("age", 30)
-            )
-            ecol1, ecol2 = st.columns(2)
-            with ecol1:
-                edit_feet = st.number_input(
-                    "Height (feet)",
-                    min_value=3,
-                    max_value=8,
-                    value=profile["height_in"] // 12,
-                )
-            with ecol2:
-                edit_inches = st.number_input(
-                    "Height (inches)",
-                    min_value=0,
-                    max_value=11,
-                    value=profile["height_in"] % 12,
-                )
-            edit_weight = st.number_input(
-                "Weight (lbs)",
-                min_value=50,
-                max_value=600,
-                value=profile.get("weight_lbs", 150),
-            )
-            edit_medical = st.text_area(
-                "Goals & Medical Notes / Limitations",
-                value=profile.get("medical_notes", ""),
-            )
-            edit_submit = st.form_submit_button("💾 Update Profile")
-
-            if edit_submit:
-                new_height = (edit_feet * 12) + edit_inches
-                final_name = edit_name.strip() if edit_name.strip() else profile["user_name"]
-
-                upsert_physical_profile(
-                    user_name=profile["user_name"],
-                    age=edit_age,
-                    height_in=new_height,
-                    weight_lbs=edit_weight,
-                    medical_notes=edit_medical,
-                )
-
-                # If name changed, rename the user in the database
-                if final_name != profile["user_name"]:
-                    rename_user(profile["user_name"], final_name)
-                    st.success(f"Profile updated! Name changed to **{final_name}**.")
-                else:
-                    st.success("Profile updated!")
-                st.rerun()
+    view_router(profile)
 
 # ─── User exists but not configured (edge case) ──────────────────────
 else:
@@ -914,7 +1339,11 @@ else:
                 weight_lbs=fix_weight,
                 medical_notes=fix_medical,
             )
-            if final_name != user:
-                rename_user(user, final_name)
-            st.success(f"Profile saved for **{final_name}**!")
-            st.rerun()
+            if final_name == user or try_rename_user(user, final_name):
+                st.success(f"Profile saved for **{final_name}**!")
+                st.rerun()
+
+
+# ─── Admin Panel (filled last, once this rerun's calls are done) ─────
+
+render_admin_panel()
@@ -0,0 +1,142 @@
+"""
+Nightly batch recommendations for the FitFlow Health App.
+Generates a workout and a dinner for every configured user, with a bounded
+number of workers sharing the app's Gemini rate limiter, and saves them to
+history in bulk. Progress is checkpointed, so re-running the same run id
+after a crash picks up where it left off:
+
+    python batch.py --workers 4 --batch-size 25
+    python batch.py --run-id 2026-10-16   # resume a specific run
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+from ai import StreamError, get_dinner_recommendation, get_workout_recommendation
+from db import get_all_user_names, get_user_bundle, save_recommendations, user_is_configured
+from similarity import looks_like_repeat
+
+CHECKPOINT_DIR = ".cache"
+
+
+class Checkpoint:
+    """JSON-lines record of the users whose results are saved for one run.
+
+    A crash mid-write can leave a truncated last line; it's skipped on load
+    (that user is simply redone) and cut off before the next write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = set()
+        self._truncate_at = None
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                lines = f.readlines()
+            offset = 0
+            for i, line in enumerate(lines):
+                if line.strip():
+                    try:
+                        self.done.add(json.loads(line)["user_name"])
+                    except ValueError:
+                        if i < len(lines) - 1:
+                            raise
+                        self._truncate_at = offset
+                offset += len(line)
+
+    def mark_done(self, user_names: list[str]):
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if self._truncate_at is not None:
+                os.truncate(self.path, self._truncate_at)
+                self._truncate_at = None
+            with open(self.path, "a") as f:
+                for name in user_names:
+                    f.write(json.dumps({"user_name": name, "saved_at": time.time()}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.done.update(user_names)
+
+
+def _generate(generate, user_name: str, kind: str, profile: dict, items: list[dict], history: list[dict]) -> str:
+    """Generate one result, retrying once if it repeats the user's history."""
+    text = generate(profile, items, history, fresh=True)
+    if not isinstance(text, StreamError) and looks_like_repeat(user_name, kind, text, history):
+        text = generate(profile, items, history, fresh=True)
+    return text
+
+
+def generate_for_user(user_name: str) -> tuple[str, str, str] | None:
+    """Return (user_name, workout, dinner), or None if the user isn't set up."""
+    bundle = get_user_bundle(user_name)
+    profile = bundle["profile"]
+    if not user_is_configured(profile):
+        return None
+    history = bundle["history"]
+    workout = _generate(get_workout_recommendation, user_name, "workout", profile, bundle["equipment"], history)
+    if isinstance(workout, StreamError):
+        raise RuntimeError(workout)
+    dinner = _generate(get_dinner_recommendation, user_name, "dinner", profile, bundle["food_preferences"], history)
+    if isinstance(dinner, StreamError):
+        raise RuntimeError(dinner)
+    return user_name, workout, dinner
+
+
+def run_batch(run_id: str, workers: int = 4, batch_size: int = 25, users: list[str] | None = None) -> dict:
+    """Generate and save recommendations for every configured user not yet done in this run."""
+    checkpoint = Checkpoint(os.path.join(CHECKPOINT_DIR, f"batch-{run_id}.jsonl"))
+    selected = users or get_all_user_names()
+    pending = [u for u in selected if u not in checkpoint.done]
+    counts = {"skipped_done": len(selected) - len(pending), "saved": 0, "not_configured": 0, "failed": 0}
+    buffer = []
+
+    def flush():
+        if buffer and save_recommendations(buffer) == len(buffer):
+            checkpoint.mark_done([user_name for user_name, _, _ in buffer])
+            counts["saved"] += len(buffer)
+        elif buffer:
+            counts["failed"] += len(buffer)
+        buffer.clear()
+
+    # Workers only generate; saving happens here, in batches, on one thread
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fitflow-batch") as pool:
+        futures = {pool.submit(generate_for_user, u): u for u in pending}
+        for future in as_completed(futures):
+            user_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                counts["failed"] += 1
+                print(f"  ✗ {user_name}: {str(e).splitlines()[0][:120]}")
+                continue
+            if result is None:
+                counts["not_configured"] += 1
+                continue
+            buffer.append(result)
+            if len(buffer) >= batch_size:
+                flush()
+    flush()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--run-id", default=date.today().isoformat(), help="checkpoint name (default: today)")
+    parser.add_argument("--workers", type=int, default=4, help="users generated at once (GEMINI_RPM still applies)")
+    parser.add_argument("--batch-size", type=int, default=25, help="results saved per insert")
+    parser.add_argument("--users", nargs="+", help="only these users")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    counts = run_batch(args.run_id, args.workers, args.batch_size, args.users)
+    print(
+        f"Run {args.run_id}: saved {counts['saved']}, already done {counts['skipped_done']}, "
+        f"not configured {counts['not_configured']}, failed {counts['failed']} "
+        f"in {time.monotonic() - started:.0f}s"
+    )
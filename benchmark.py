@@ -0,0 +1,306 @@
+"""
+Offline benchmark for the FitFlow Health App.
+Runs app.py headlessly with Streamlit's AppTest against the local Supabase
+and Gemini stand-ins (see local_backend.py), and reports wall time, DB round
+trips and model calls for every rerun of some scripted user journeys, with
+p50/p95/p99 per step. It also counts the db.py calls each step makes (cache
+hits included), and how many of those a browser skips because the click
+only reruns the fragment it's in:
+
+    python benchmark.py --iterations 20 --db-latency-ms 20 --gemini-latency-ms 300
+
+Nothing leaves the machine, so runs are repeatable and free.
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+
+# Point every backend at the local stand-ins before any app module reads its
+# settings. Real values in .streamlit/secrets.toml would win; main() checks.
+BENCHMARK_SETTINGS = {
+    "SUPABASE_URL": "local://",
+    "GEMINI_API_KEY": "local://",
+    "GEMINI_RPM": "6000",  # Measure the app, not the free-tier quota
+    "GEMINI_BURST": "100",
+    "GEMINI_CACHE_PATH": ":memory:",
+    "PREFETCH_ENABLED": "false",
+}
+os.environ.update(BENCHMARK_SETTINGS)
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from ai import get_rate_limiter, get_response_cache  # noqa: E402
+from db import get_read_cache, seed_default_users, upsert_physical_profile  # noqa: E402
+from local_backend import GEMINI, STORE  # noqa: E402
+from settings import get_setting  # noqa: E402
+from similarity import get_similarity_index  # noqa: E402
+from tracing import add_listener  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+BENCH_USER = "Ashley"
+
+
+# ─── Journey Steps ───────────────────────────────────────────────────
+# Each step drives the app through exactly one interaction (one script run,
+# plus any st.rerun() it triggers).
+
+def _button(at: AppTest, label: str):
+    return next(b for b in at.button if b.label == label)
+
+
+def _open_view(at: AppTest, label: str):
+    at.radio(key="active_view").set_value(label).run()
+
+
+def open_app(at: AppTest):
+    at.run()
+
+
+def select_profile(at: AppTest):
+    at.selectbox(key="user_dropdown").select(BENCH_USER).run()
+
+
+def open_equipment_view(at: AppTest):
+    _open_view(at, "🔧 My Equipment")
+
+
+def open_struggle_view(at: AppTest):
+    _open_view(at, "🚌 Struggle Bus")
+
+
+def add_equipment(at: AppTest):
+    next(t for t in at.text_input if t.label == "Equipment Name").input("Kettlebell")
+    _button(at, "Add Equipment").click().run()
+
+
+def add_equipment_bulk(at: AppTest):
+    items = "\n".join(f"Item {i}, strength" for i in range(30))
+    next(t for t in at.text_area if t.label == "One per line: name, category, notes").input(items)
+    _button(at, "Add All Equipment").click().run()
+
+
+def delete_equipment(at: AppTest):
+    next(b for b in at.button if (b.key or "").startswith("del_eq_")).click().run()
+
+
+def check_struggle(at: AppTest):
+    next(c for c in at.checkbox if (c.key or "").startswith("struggle_")).check().run()
+
+
+def generate_workout(at: AppTest):
+    _button(at, "🎲 Generate Workout").click().run()
+
+
+def generate_dinner(at: AppTest):
+    _button(at, "🎲 Generate Dinner Idea").click().run()
+
+
+def get_recipe(at: AppTest):
+    _button(at, "📜 Yes, give me the recipe!").click().run()
+
+
+def get_recipe_again(at: AppTest):
+    """Ask for the same recipe twice: the second answer comes from the response cache."""
+    get_recipe(at)
+
+
+def generate_fresh_workout(at: AppTest):
+    at.toggle[0].set_value(True).run()
+    _button(at, "🎲 Generate Workout").click().run()
+
+
+JOURNEYS = {
+    "select_profile": [open_app, select_profile],
+    "add_equipment": [open_app, select_profile, open_equipment_view, add_equipment],
+    "add_equipment_bulk": [open_app, select_profile, open_equipment_view, add_equipment_bulk],
+    "delete_equipment": [open_app, select_profile, open_equipment_view, add_equipment, delete_equipment],
+    "check_struggle": [open_app, select_profile, open_struggle_view, check_struggle],
+    "generate_workout": [open_app, select_profile, generate_workout],
+    "generate_dinner": [open_app, select_profile, generate_dinner],
+    "get_recipe": [open_app, select_profile, generate_dinner, get_recipe],
+    "get_recipe_cached": [open_app, select_profile, generate_dinner, get_recipe, get_recipe_again],
+    "generate_fresh_workout": [open_app, select_profile, generate_fresh_workout],
+}
+
+# The app fragment (see app.fragment) each step's widget is in. AppTest always
+# reruns the whole script, but in a browser that click reruns only this
+# fragment. Steps not listed (the profile dropdown) rerun the whole app.
+STEP_FRAGMENTS = {
+    "open_equipment_view": "view_router",
+    "open_struggle_view": "view_router",
+    "add_equipment": "equipment_view",
+    "add_equipment_bulk": "equipment_view",
+    "delete_equipment": "equipment_list",
+    "check_struggle": "struggle_bus_view",
+    "generate_workout": "recommendations_view",
+    "generate_dinner": "recommendations_view",
+    "get_recipe": "recipe_panel",
+    "get_recipe_again": "recipe_panel",
+    "generate_fresh_workout": "recommendations_view",
+}
+
+
+# ─── Runner ──────────────────────────────────────────────────────────
+
+def reset_backends(args):
+    """Start a run from the same data: seeded users, one configured profile, empty caches."""
+    STORE.reset()
+    GEMINI.reset()
+    get_read_cache().clear()
+    get_response_cache().clear()
+    get_similarity_index().clear()
+    get_rate_limiter().reset()
+    seed_default_users()
+    upsert_physical_profile(BENCH_USER, 34, 66, 150, "Mild lower back tightness")
+    STORE.latency_s = args.db_latency_ms / 1000
+    GEMINI.latency_s = args.gemini_latency_ms / 1000
+    GEMINI.chunk_delay_s = args.chunk_delay_ms / 1000
+    GEMINI.rate_limit_rate = args.rate_limit_rate
+
+
+def db_calls(spans: list[dict], fragment: str | None = None) -> int:
+    """db.py calls made drawing the page, or only those inside `fragment`.
+
+    Background writes are left out: they cost the same however the page reruns.
+    """
+    return sum(
+        1 for s in spans
+        if s["name"].startswith("db.")
+        and not any(p.startswith("db.") for p in s["parents"])
+        and not s["thread"].startswith("fitflow-db-write")
+        and (fragment is None or f"fragment.{fragment}" in s["parents"])
+    )
+
+
+def run_journey(name: str, steps, timeout: float, spans: list[dict] | None = None) -> list[dict]:
+    """Run one journey in a fresh session and measure each step.
+
+    Pass the list an add_listener() hook fills to also count db.py calls.
+    A step's error_kind is "app" if the script raised, or "harness" if
+    driving it did (a missing widget, an AppTest timeout or crash).
+    """
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    samples = []
+    spans = spans if spans is not None else []
+    for step in steps:
+        round_trips, model_calls, rate_limited = STORE.round_trips, GEMINI.calls, GEMINI.rate_limited
+        first_span = len(spans)
+        started = time.perf_counter()
+        error = error_kind = None
+        try:
+            step(at)
+            if at.exception:
+                error, error_kind = at.exception[0].value, "app"
+        except Exception as e:
+            error, error_kind = repr(e), "harness"
+        step_spans = spans[first_span:]
+        fragment = STEP_FRAGMENTS.get(step.__name__)
+        samples.append({
+            "journey": name,
+            "step": step.__name__,
+            "seconds": time.perf_counter() - started,
+            "round_trips": STORE.round_trips - round_trips,
+            "db_calls": db_calls(step_spans),
+            "fragment_db_calls": db_calls(step_spans, fragment) if fragment else db_calls(step_spans),
+            "model_calls": GEMINI.calls - model_calls,
+            "rate_limited": GEMINI.rate_limited - rate_limited,
+            "error": error,
+            "error_kind": error_kind,
+        })
+        if error:
+            break  # Later steps depend on this one
+    return samples
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: list[dict]) -> list[dict]:
+    """Aggregate samples per (journey, step)."""
+    groups = {}
+    for s in samples:
+        groups.setdefault((s["journey"], s["step"]), []).append(s)
+    rows = []
+    for (journey, step), group in groups.items():
+        seconds = [s["seconds"] for s in group]
+        rows.append({
+            "journey": journey,
+            "step": step,
+            "runs": len(group),
+            "errors": sum(bool(s["error"]) for s in group),
+            "p50_ms": percentile(seconds, 50) * 1000,
+            "p95_ms": percentile(seconds, 95) * 1000,
+            "p99_ms": percentile(seconds, 99) * 1000,
+            "round_trips": sum(s["round_trips"] for s in group) / len(group),
+            "model_calls": sum(s["model_calls"] for s in group) / len(group),
+            "db_calls": sum(s["db_calls"] for s in group) / len(group),
+            "db_calls_saved": sum(s["db_calls"] - s["fragment_db_calls"] for s in group) / len(group),
+        })
+    return rows
+
+
+def print_table(rows: list[dict]):
+    header = (
+        f"{'journey':<24}{'step':<24}{'runs':>5}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'db rt':>7}{'model':>7}{'db calls':>10}{'saved':>7}"
+    )
+    print(header)
+    print("─" * len(header))
+    for r in rows:
+        print(
+            f"{r['journey']:<24}{r['step']:<24}{r['runs']:>5}{r['errors']:>5}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+            f"{r['round_trips']:>7.1f}{r['model_calls']:>7.1f}"
+            f"{r['db_calls']:>10.1f}{r['db_calls_saved']:>7.1f}"
+        )
+    print("\n'saved': db.py calls (cache hits included) a browser skips because the click")
+    print("reruns only the fragment it's in; AppTest itself always reruns the whole script.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10, help="runs of each journey")
+    parser.add_argument("--journeys", nargs="+", choices=sorted(JOURNEYS), default=list(JOURNEYS))
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated latency per DB round trip")
+    parser.add_argument("--gemini-latency-ms", type=float, default=0.0, help="simulated time to first token")
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0, help="simulated delay between streamed chunks")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="chance (0-1) a model call returns 429")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per script run")
+    parser.add_argument("--json", metavar="PATH", help="also write raw samples and the summary here")
+    args = parser.parse_args()
+
+    for name, value in BENCHMARK_SETTINGS.items():
+        if name in ("SUPABASE_URL", "GEMINI_API_KEY") and get_setting(name) != value:
+            parser.exit(1, f"{name} is set in .streamlit/secrets.toml; move it aside to benchmark offline.\n")
+
+    spans = []
+    add_listener(spans.append)
+    samples = []
+    for name in args.journeys:
+        for _ in range(args.iterations):
+            reset_backends(args)
+            samples.extend(run_journey(name, JOURNEYS[name], args.timeout, spans))
+            spans.clear()
+
+    rows = summarize(samples)
+    print_table(rows)
+    rate_limited = sum(s["rate_limited"] for s in samples)
+    if rate_limited:
+        print(f"\nInjected 429s: {rate_limited} of {sum(s['model_calls'] for s in samples)} model calls")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "summary": rows, "samples": samples}, f, indent=2, default=str)
+    failed = [s for s in samples if s["error"]]
+    if failed:
+        first = failed[0]
+        parser.exit(1, f"\n{len(failed)} steps failed, e.g. {first['journey']}/{first['step']}: {first['error']}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+One-time database bootstrap for the FitFlow Health App.
+Seeds the default user slots. Idempotent — run it on each deploy:
+
+    python bootstrap.py
+"""
+
+from db import seed_default_users
+
+
+if __name__ == "__main__":
+    created = seed_default_users()
+    if created:
+        print(f"Created default users: {', '.join(created)}")
+    else:
+        print("Default users already exist — nothing to do.")
@@ -0,0 +1,59 @@
+"""
+Bulk import parsing for the FitFlow Health App.
+Turns a pasted list or an uploaded CSV ("name, category, notes" per line)
+into rows for the equipment and food preference tables, skipping any header
+row the file starts with.
+"""
+
+import csv
+import io
+import re
+
+# Column names a header row may use for each field (compared ignoring case,
+# spaces, dashes and underscores)
+HEADER_ALIASES = {
+    "name": {"name", "item", "itemname", "equipment", "equipmentname"},
+    "category": {"category", "type", "kind"},
+    "notes": {"notes", "note", "description", "details"},
+    "item_name": {"itemname", "item", "name", "food", "fooditem"},
+    "preference_type": {"preferencetype", "preference", "type"},
+    "nutritional_goal": {"nutritionalgoal", "goal", "notes"},
+}
+
+
+def is_header(values: list[str], fields: tuple[str, ...]) -> bool:
+    """True if every filled-in cell names the field in its column."""
+    return all(
+        re.sub(r"[\s_-]", "", value.lower()) in HEADER_ALIASES.get(field, {field})
+        for field, value in zip(fields, values)
+        if value
+    )
+
+
+def parse_rows(text: str, fields: tuple[str, ...]) -> list[dict]:
+    """Parse one item per line ("name, category, notes") into dicts keyed by `fields`.
+
+    Works for pasted text and CSV files alike: a header row naming the
+    fields (e.g. "Equipment, Type") is skipped, and missing trailing values
+    are left blank.
+    """
+    rows = []
+    for values in csv.reader(io.StringIO(text), skipinitialspace=True):
+        values = [v.strip() for v in values]
+        if not values or not values[0]:
+            continue
+        if is_header(values, fields):
+            continue
+        rows.append(dict(zip(fields, values + [""] * len(fields))))
+    return rows
+
+
+def bulk_text(pasted: str, uploaded) -> str:
+    """Combine pasted text with an uploaded CSV file, if any."""
+    return pasted + "\n" + (uploaded.getvalue().decode("utf-8-sig") if uploaded else "")
+
+
+def one_of(value: str, options: list[str], default: str) -> str:
+    """`value` if it's one of `options` (ignoring case), else `default`."""
+    value = value.strip().lower()
+    return value if value in options else default
@@ -3,41 +3,366 @@ Supabase database helper for the Galactic Gains Health App.
 Handles all reads/writes to physical_profile, equipment_inventory, and food_preferences.
 """
 
-import streamlit as st
+import copy
+import functools
+import inspect
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
 from supabase import create_client, Client
 
+from local_backend import LocalSupabaseClient
+from settings import get_setting, process_wide
+from similarity import get_similarity_index
+from summaries import summarize
+from tracing import annotate, record_error, traced
+
+logger = logging.getLogger(__name__)
+
+# ─── Connection Pool ─────────────────────────────────────────────────
 
-def get_supabase_client() -> Client:
-    """Create and return a Supabase client using Streamlit secrets."""
-    url = st.secrets["SUPABASE_URL"]
-    key = st.secrets["SUPABASE_KEY"]
+def _create_client() -> Client:
+    """Build a new Supabase client (or the local stand-in for local:// URLs)."""
+    url = get_setting("SUPABASE_URL")
+    key = get_setting("SUPABASE_KEY", "")
+    if url.startswith("local://"):
+        return LocalSupabaseClient(url, key)
     return create_client(url, key)
 
 
+def _ping(client: Client) -> bool:
+    """Cheap health check: can this client still reach the database?"""
+    try:
+        client.table("physical_profile").select("user_name").limit(1).execute()
+        return True
+    except Exception:
+        return False
+
+
+class ClientPool:
+    """A fixed-size, thread-safe pool of reusable Supabase clients.
+
+    Each client keeps its own HTTP session, so reusing clients keeps TLS
+    connections alive between calls instead of reconnecting every time.
+    Clients idle longer than `health_check_after` seconds (or that raised
+    during their last use) are pinged before reuse and rebuilt if dead.
+    """
+
+    def __init__(self, factory=_create_client, size: int = 4, health_check_after: float = 30.0):
+        self._factory = factory
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()  # LIFO keeps the warmest connection in use
+        self._lock = threading.Lock()
+        self.size = size
+        self.health_check_after = health_check_after
+        self.created = 0
+        self.reconnects = 0
+
+    def _new_client(self) -> Client:
+        with self._lock:
+            self.created += 1
+        return self._factory()
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a client for the duration of a with-block."""
+        self._slots.acquire()
+        try:
+            try:
+                client, last_ok, needs_check = self._idle.get_nowait()
+            except queue.Empty:
+                client, last_ok, needs_check = self._new_client(), time.monotonic(), False
+            stale = time.monotonic() - last_ok > self.health_check_after
+            if (needs_check or stale) and not _ping(client):
+                with self._lock:
+                    self.reconnects += 1
+                client = self._new_client()
+            try:
+                yield client
+            except Exception:
+                self._idle.put((client, time.monotonic(), True))  # Ping before next use
+                raise
+            else:
+                self._idle.put((client, time.monotonic(), False))
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "created": self.created,
+            "reconnects": self.reconnects,
+            "idle": self._idle.qsize(),
+        }
+
+
+@process_wide
+def get_client_pool() -> ClientPool:
+    """Return the process-wide client pool, shared by every session."""
+    return ClientPool(
+        size=get_setting("SUPABASE_POOL_SIZE", 4, int),
+        health_check_after=get_setting("SUPABASE_HEALTH_CHECK_SECONDS", 30.0, float),
+    )
+
+
+@contextmanager
+def supabase_client():
+    """Borrow a pooled Supabase client: `with supabase_client() as sb: ...`"""
+    with get_client_pool().acquire() as sb:
+        yield sb
+
+
+# ─── Read Cache ──────────────────────────────────────────────────────
+
+class ReadCache:
+    """A thread-safe, read-through TTL + LRU cache for per-user reads.
+
+    Keys are tuples starting with (kind, user_name), e.g. ("equipment", "Ashley").
+    Values are deep-copied in and out so callers can't mutate cached rows.
+    Every invalidation bumps `generation`, so a load that started before one
+    (and may have read the old rows) is not stored afterwards.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        """Return (True, value) on a fresh hit, else (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, copy.deepcopy(entry[1])
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: tuple, value, generation: int | None = None):
+        """Store `value`, unless it was loaded before an invalidation since `generation`."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: tuple, loader):
+        found, value = self.get(key)
+        if found:
+            return value
+        generation = self.generation
+        value = loader()
+        self.put(key, value, generation)
+        return value
+
+    def invalidate(self, kinds, user_name=None, any_user: bool = False):
+        """Drop entries of the given kinds for one user (or every user)."""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._entries):
+                if key[0] in kinds and (any_user or key[1] == user_name):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+USER_KINDS = ("profile", "equipment", "food_preferences", "history")
+
+
+@process_wide
+def get_read_cache() -> ReadCache:
+    """Return the process-wide read cache shared by every session."""
+    return ReadCache(
+        ttl=get_setting("DB_CACHE_TTL_SECONDS", 300.0, float),
+        max_entries=get_setting("DB_CACHE_MAX_ENTRIES", 512, int),
+    )
+
+
+def read_cache_stats() -> dict:
+    """Hit/miss counters for the db read cache."""
+    return get_read_cache().stats()
+
+
+def _cached(kind: str):
+    """Cache a getter whose first argument (if any) is the user_name.
+
+    Defaults are filled in, so get_recommendation_history("A") and
+    get_recommendation_history("A", limit=7) share one entry.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            values = tuple(bound.arguments.values())
+            user_name = values[0] if values else None
+            key = (kind, user_name, *values[1:])
+            return get_read_cache().get_or_load(key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+_change_listeners = []
+
+
+def on_user_data_change(callback):
+    """Register `callback(user_name, kinds)` to run after every write.
+
+    user_name is None when the affected user isn't known (treat as "anyone").
+    """
+    _change_listeners.append(callback)
+
+
+def _notify(user_name: str | None, kinds: tuple):
+    for callback in _change_listeners:
+        callback(user_name, kinds)
+
+
+def _invalidate(user_name: str, *kinds: str):
+    get_read_cache().invalidate(kinds, user_name)
+    _notify(user_name, kinds)
+
+
+def _invalidate_deleted(resp, kind: str):
+    """Invalidate the owners of deleted rows, or every user if unknown."""
+    owners = {row.get("user_name") for row in resp.data or []}
+    if not owners:
+        get_read_cache().invalidate((kind,), any_user=True)
+        _notify(None, (kind,))
+    for owner in owners:
+        _invalidate(owner, kind)
+
+
+# ─── Background Writes ───────────────────────────────────────────────
+
+@process_wide
+def get_write_executor() -> ThreadPoolExecutor:
+    """Return the process-wide pool that runs writes off the script thread."""
+    return ThreadPoolExecutor(
+        max_workers=get_setting("DB_WRITE_WORKERS", 2, int),
+        thread_name_prefix="fitflow-db-write",
+    )
+
+
+def write_in_background(fn, *args) -> Future:
+    """Run a db write (e.g. delete_equipment_items) without waiting for it.
+
+    The returned Future raises the write's exception, so the caller can roll
+    back whatever it showed optimistically. Caches are invalidated as usual
+    once the write lands.
+    """
+    return get_write_executor().submit(fn, *args)
+
+
+# ─── Bootstrap ───────────────────────────────────────────────────────
+
+DEFAULT_USERS = ["Ashley", "User A", "User B", "User C", "User D"]
+
+
+@traced("physical_profile")
+def seed_default_users(names: list[str] = DEFAULT_USERS) -> list[str]:
+    """Create any missing default user slots in one INSERT ... ON CONFLICT DO NOTHING.
+
+    Idempotent — safe to run on every deploy. Returns the names it created.
+    ON CONFLICT needs the unique constraint on user_name from setup.sql; on
+    databases that don't have it yet, falls back to inserting only the names
+    that aren't there.
+    """
+    rows = [
+        {"user_name": u, "age": 0, "height_in": 0, "weight_lbs": 0, "medical_notes": ""}
+        for u in names
+    ]
+    try:
+        created = upsert_physical_profiles(rows, ignore_existing=True)
+    except Exception as e:
+        record_error(e)
+        logger.warning(
+            "Seeding with ON CONFLICT failed (is the user_name unique constraint "
+            "from setup.sql applied?); inserting missing users instead: %s", e,
+        )
+        with supabase_client() as sb:
+            resp = sb.table("physical_profile").select("user_name").execute()
+            existing = {row["user_name"] for row in resp.data or []}
+            missing = [r for r in rows if r["user_name"] not in existing]
+            created = (
+                sb.table("physical_profile").insert(missing).execute().data or []
+                if missing else []
+            )
+        _invalidate(None, "user_names")
+    return [row["user_name"] for row in created]
+
+
 # ─── Physical Profile ────────────────────────────────────────────────
 
+def user_is_configured(profile: dict | None) -> bool:
+    """A user is configured if they have height, weight, and age filled in."""
+    if not profile:
+        return False
+    return all([
+        profile.get("height_in", 0) > 0,
+        profile.get("weight_lbs", 0) > 0,
+        profile.get("age", 0) > 0,
+    ])
+
+
+@_cached("user_names")
+@traced("physical_profile")
 def get_all_user_names() -> list[str]:
     """Return a list of all distinct user_name values from physical_profile."""
-    sb = get_supabase_client()
-    resp = sb.table("physical_profile").select("user_name").execute()
+    with supabase_client() as sb:
+        resp = sb.table("physical_profile").select("user_name").execute()
     names = sorted(set(row["user_name"] for row in resp.data)) if resp.data else []
     return names
 
 
+@_cached("profile")
+@traced("physical_profile")
 def get_physical_profile(user_name: str) -> dict | None:
     """Return the physical profile row for a given user, or None."""
-    sb = get_supabase_client()
-    resp = (
-        sb.table("physical_profile")
-        .select("*")
-        .eq("user_name", user_name)
-        .execute()
-    )
+    with supabase_client() as sb:
+        resp = (
+            sb.table("physical_profile")
+            .select("*")
+            .eq("user_name", user_name)
+            .execute()
+        )
     if resp.data:
         return resp.data[0]
     return None
 
 
+@traced("physical_profile")
 def upsert_physical_profile(
     user_name: str,
     age: int,
@@ -45,172 +370,391 @@ def upsert_physical_profile(
     weight_lbs: int,
     medical_notes: str,
 ) -> dict:
-    """Insert or update a physical profile row. Returns the upserted row."""
-    sb = get_supabase_client()
-    existing = get_physical_profile(user_name)
-    if existing:
-        resp = (
-            sb.table("physical_profile")
-            .update(
-                {
-                    "age": age,
-                    "height_in": height_in,
-                    "weight_lbs": weight_lbs,
-                    "medical_notes": medical_notes,
-                    "updated_at": "now()",
-                }
-            )
-            .eq("user_name", user_name)
-            .execute()
-        )
-    else:
+    """Insert or update a physical profile row in one statement. Returns the upserted row."""
+    rows = upsert_physical_profiles(
+        [
+            {
+                "user_name": user_name,
+                "age": age,
+                "height_in": height_in,
+                "weight_lbs": weight_lbs,
+                "medical_notes": medical_notes,
+            }
+        ]
+    )
+    return rows[0] if rows else {}
+
+
+@traced("physical_profile")
+def upsert_physical_profiles(profiles: list[dict], ignore_existing: bool = False) -> list[dict]:
+    """Insert or update many profile rows in one round trip.
+
+    Relies on the unique constraint on user_name (see setup.sql). With
+    ignore_existing=True, existing users are left untouched and only newly
+    inserted rows are returned. Each dict needs the same keys.
+    """
+    if not profiles:
+        return []
+    rows = [{**p, "updated_at": "now()"} for p in profiles]
+    with supabase_client() as sb:
         resp = (
             sb.table("physical_profile")
-            .insert(
-                {
-                    "user_name": user_name,
-                    "age": age,
-                    "height_in": height_in,
-                    "weight_lbs": weight_lbs,
-                    "medical_notes": medical_notes,
-                }
-            )
+            .upsert(rows, on_conflict="user_name", ignore_duplicates=ignore_existing)
             .execute()
         )
-    return resp.data[0] if resp.data else {}
+    for p in profiles:
+        _invalidate(p["user_name"], "profile")
+    _invalidate(None, "user_names")
+    return resp.data or []
+
+
+def is_unique_violation(error: Exception) -> bool:
+    """True if a write failed because it would duplicate a unique key (Postgres 23505)."""
+    return (
+        getattr(error, "code", None) == "23505"
+        or "duplicate key value violates unique constraint" in str(error)
+    )
 
 
+@traced("rpc:rename_user")
 def rename_user(old_name: str, new_name: str):
-    """Rename a user across all three tables."""
-    sb = get_supabase_client()
-    sb.table("physical_profile").update({"user_name": new_name}).eq("user_name", old_name).execute()
-    sb.table("equipment_inventory").update({"user_name": new_name}).eq("user_name", old_name).execute()
-    sb.table("food_preferences").update({"user_name": new_name}).eq("user_name", old_name).execute()
+    """Rename a user across all four tables atomically, in one round trip.
+
+    Uses the `rename_user` function from setup.sql; if it fails, nothing is renamed.
+    """
+    with supabase_client() as sb:
+        sb.rpc("rename_user", {"p_old_name": old_name, "p_new_name": new_name}).execute()
+    get_similarity_index().rename(old_name, new_name)
+    _invalidate(old_name, *USER_KINDS)
+    _invalidate(new_name, *USER_KINDS)
+    _invalidate(None, "user_names")
 
 
+@traced("physical_profile")
 def update_weight(user_name: str, weight_lbs: int):
     """Quick-update just the weight for a user."""
-    sb = get_supabase_client()
-    sb.table("physical_profile").update(
-        {"weight_lbs": weight_lbs, "updated_at": "now()"}
-    ).eq("user_name", user_name).execute()
+    with supabase_client() as sb:
+        sb.table("physical_profile").update(
+            {"weight_lbs": weight_lbs, "updated_at": "now()"}
+        ).eq("user_name", user_name).execute()
+    _invalidate(user_name, "profile")
 
 
 # ─── Equipment Inventory ─────────────────────────────────────────────
 
+@_cached("equipment")
+@traced("equipment_inventory")
 def get_equipment(user_name: str) -> list[dict]:
     """Return all equipment rows for a user."""
-    sb = get_supabase_client()
-    resp = (
-        sb.table("equipment_inventory")
-        .select("*")
-        .eq("user_name", user_name)
-        .order("id")
-        .execute()
-    )
+    with supabase_client() as sb:
+        resp = (
+            sb.table("equipment_inventory")
+            .select("*")
+            .eq("user_name", user_name)
+            .order("id")
+            .execute()
+        )
     return resp.data or []
 
 
+@traced("equipment_inventory")
 def add_equipment(user_name: str, name: str, category: str, notes: str = "") -> dict:
     """Add an equipment item for a user."""
-    sb = get_supabase_client()
-    resp = (
-        sb.table("equipment_inventory")
-        .insert(
-            {
-                "user_name": user_name,
-                "name": name,
-                "category": category,
-                "notes": notes,
-            }
+    rows = add_equipment_items(user_name, [{"name": name, "category": category, "notes": notes}])
+    return rows[0] if rows else {}
+
+
+@traced("equipment_inventory")
+def add_equipment_items(user_name: str, items: list[dict]) -> list[dict]:
+    """Add many equipment items (dicts of name, category, notes) in one insert."""
+    if not items:
+        return []
+    with supabase_client() as sb:
+        resp = (
+            sb.table("equipment_inventory")
+            .insert(
+                [
+                    {
+                        "user_name": user_name,
+                        "name": item["name"],
+                        "category": item.get("category") or "other",
+                        "notes": item.get("notes") or "",
+                    }
+                    for item in items
+                ]
+            )
+            .execute()
         )
-        .execute()
-    )
-    return resp.data[0] if resp.data else {}
+    _invalidate(user_name, "equipment")
+    return resp.data or []
 
 
+@traced("equipment_inventory")
 def delete_equipment(row_id: int):
     """Delete an equipment row by its primary key."""
-    sb = get_supabase_client()
-    sb.table("equipment_inventory").delete().eq("id", row_id).execute()
+    delete_equipment_items([row_id])
+
+
+@traced("equipment_inventory")
+def delete_equipment_items(row_ids: list[int]):
+    """Delete many equipment rows by primary key in one request."""
+    if not row_ids:
+        return
+    with supabase_client() as sb:
+        resp = sb.table("equipment_inventory").delete().in_("id", list(row_ids)).execute()
+    _invalidate_deleted(resp, "equipment")
 
 
 # ─── Food Preferences ────────────────────────────────────────────────
 
+@_cached("food_preferences")
+@traced("food_preferences")
 def get_food_preferences(user_name: str) -> list[dict]:
     """Return all food preference rows for a user."""
-    sb = get_supabase_client()
-    resp = (
-        sb.table("food_preferences")
-        .select("*")
-        .eq("user_name", user_name)
-        .order("id")
-        .execute()
-    )
+    with supabase_client() as sb:
+        resp = (
+            sb.table("food_preferences")
+            .select("*")
+            .eq("user_name", user_name)
+            .order("id")
+            .execute()
+        )
     return resp.data or []
 
 
+@traced("food_preferences")
 def add_food_preference(
     user_name: str, item_name: str, preference_type: str, nutritional_goal: str = ""
 ) -> dict:
     """Add a food preference for a user."""
-    sb = get_supabase_client()
-    resp = (
-        sb.table("food_preferences")
-        .insert(
-            {
-                "user_name": user_name,
-                "item_name": item_name,
-                "preference_type": preference_type,
-                "nutritional_goal": nutritional_goal,
-            }
-        )
-        .execute()
+    rows = add_food_preferences(
+        user_name,
+        [{"item_name": item_name, "preference_type": preference_type, "nutritional_goal": nutritional_goal}],
     )
-    return resp.data[0] if resp.data else {}
+    return rows[0] if rows else {}
+
+
+@traced("food_preferences")
+def add_food_preferences(user_name: str, prefs: list[dict]) -> list[dict]:
+    """Add many food preferences (dicts of item_name, preference_type, nutritional_goal) in one insert."""
+    if not prefs:
+        return []
+    with supabase_client() as sb:
+        resp = (
+            sb.table("food_preferences")
+            .insert(
+                [
+                    {
+                        "user_name": user_name,
+                        "item_name": pref["item_name"],
+                        "preference_type": pref.get("preference_type") or "like",
+                        "nutritional_goal": pref.get("nutritional_goal") or "",
+                    }
+                    for pref in prefs
+                ]
+            )
+            .execute()
+        )
+    _invalidate(user_name, "food_preferences")
+    return resp.data or []
 
 
+@traced("food_preferences")
 def delete_food_preference(row_id: int):
     """Delete a food preference row by its primary key."""
-    sb = get_supabase_client()
-    sb.table("food_preferences").delete().eq("id", row_id).execute()
+    delete_food_preferences([row_id])
+
+
+@traced("food_preferences")
+def delete_food_preferences(row_ids: list[int]):
+    """Delete many food preference rows by primary key in one request."""
+    if not row_ids:
+        return
+    with supabase_client() as sb:
+        resp = sb.table("food_preferences").delete().in_("id", list(row_ids)).execute()
+    _invalidate_deleted(resp, "food_preferences")
 
 
 # ─── Recommendation History ──────────────────────────────────────────
 
-def get_recommendation_history(user_name: str, limit: int = 10) -> list[dict]:
+# How many past recommendations the prompts look at
+HISTORY_LIMIT = 7
+
+# The compact summary and short preview columns (see setup.sql) — all the prompts need
+HISTORY_PROMPT_COLUMNS = (
+    "created_at",
+    "workout_summary",
+    "dinner_summary",
+    "workout_preview",
+    "dinner_preview",
+)
+
+
+@_cached("history")
+@traced("recommendation_history")
+def get_recommendation_history(
+    user_name: str, limit: int = HISTORY_LIMIT, columns: tuple = HISTORY_PROMPT_COLUMNS
+) -> list[dict]:
     """Return recent recommendation history for a user (newest first).
 
+    Only `columns` are fetched, so renders don't ship full markdown.
     This reads from a 'recommendation_history' table if it exists.
     If the table doesn't exist yet, returns an empty list gracefully.
     """
-    sb = get_supabase_client()
-    try:
-        resp = (
-            sb.table("recommendation_history")
-            .select("*")
-            .eq("user_name", user_name)
-            .order("created_at", desc=True)
-            .limit(limit)
-            .execute()
-        )
+    def fetch(cols):
+        with supabase_client() as sb:
+            resp = (
+                sb.table("recommendation_history")
+                .select(", ".join(cols))
+                .eq("user_name", user_name)
+                .order("created_at", desc=True)
+                .limit(limit)
+                .execute()
+            )
         return resp.data or []
-    except Exception:
+
+    try:
+        return fetch(columns)
+    except Exception as e:
+        record_error(e)
+    try:
+        # Preview columns not created yet — fall back to the original ones
+        return fetch(("created_at", "workout", "dinner"))
+    except Exception as e:
+        record_error(e)
         return []
 
 
+@traced("recommendation_history")
 def save_recommendation(
     user_name: str, workout: str, dinner: str
 ):
-    """Save a recommendation to history. Silently fails if table doesn't exist."""
-    sb = get_supabase_client()
+    """Save a recommendation to history. Silently fails if the table doesn't exist."""
+    save_recommendations([(user_name, workout, dinner)])
+
+
+@traced("recommendation_history")
+def save_recommendations(recommendations: list[tuple[str, str, str]]) -> int:
+    """Save many (user_name, workout, dinner) recommendations in one insert.
+
+    Stores the full markdown plus a structured summary of each (see
+    summaries.py), which is what the prompts read back. Returns how many
+    rows were saved (0 if the table doesn't exist).
+    """
+    rows = []
+    for user_name, workout, dinner in recommendations:
+        row = {"user_name": user_name, "workout": workout, "dinner": dinner}
+        for kind, text in (("workout", workout), ("dinner", dinner)):
+            summary = summarize(kind, text)
+            row[f"{kind}_summary"] = summary
+            get_similarity_index().add(user_name, kind, summary)
+        rows.append(row)
+    if not rows:
+        return 0
+    saved = 0
     try:
-        sb.table("recommendation_history").insert(
-            {
-                "user_name": user_name,
-                "workout": workout,
-                "dinner": dinner,
-            }
-        ).execute()
-    except Exception:
-        pass  # Table may not exist yet — that's okay
+        with supabase_client() as sb:
+            try:
+                sb.table("recommendation_history").insert(rows).execute()
+            except Exception as e:
+                record_error(e)
+                # Summary columns not created yet — save the text only
+                sb.table("recommendation_history").insert(
+                    [{k: row[k] for k in ("user_name", "workout", "dinner")} for row in rows]
+                ).execute()
+        saved = len(rows)
+    except Exception as e:
+        record_error(e)  # Table may not exist yet — that's okay
+    for user_name in dict.fromkeys(row["user_name"] for row in rows):
+        _invalidate(user_name, "history")
+    return saved
+
+
+# ─── Per-Render Bundle ───────────────────────────────────────────────
+
+BUNDLE_PARTS = ("user_names", "profile", "equipment", "food_preferences", "history")
+
+# Parts that belong to one user (skipped when no user is selected)
+USER_PARTS = ("profile", "equipment", "food_preferences", "history")
+
+
+def _bundle_keys(user_name: str | None, history_limit: int, parts: tuple) -> dict:
+    """The read-cache key of each requested bundle part."""
+    keys = {
+        "user_names": ("user_names", None),
+        "profile": ("profile", user_name),
+        "equipment": ("equipment", user_name),
+        "food_preferences": ("food_preferences", user_name),
+        "history": ("history", user_name, history_limit, HISTORY_PROMPT_COLUMNS),
+    }
+    return {
+        part: keys[part] for part in parts if user_name or part not in USER_PARTS
+    }
+
+
+def _cached_bundle(user_name: str | None, history_limit: int, parts: tuple) -> dict:
+    """The requested bundle parts that are already in the read cache."""
+    cache = get_read_cache()
+    bundle = {}
+    for part, key in _bundle_keys(user_name, history_limit, parts).items():
+        found, value = cache.get(key)
+        if found:
+            bundle[part] = value
+    return bundle
+
+
+def _prime_cache(user_name: str | None, history_limit: int, bundle: dict, generation: int):
+    """Store each part of a freshly loaded bundle under its own cache key."""
+    cache = get_read_cache()
+    for part, key in _bundle_keys(user_name, history_limit, tuple(bundle)).items():
+        cache.put(key, bundle[part], generation)
+
+
+@traced("rpc:get_user_bundle")
+def get_user_bundle(
+    user_name: str | None, history_limit: int = HISTORY_LIMIT, parts: tuple = BUNDLE_PARTS
+) -> dict:
+    """Return the data a page (or one view of it) needs in a single round trip.
+
+    Calls the `get_user_bundle` function from setup.sql for just the
+    requested `parts` (any of BUNDLE_PARTS) that aren't already cached. If
+    the function hasn't been created yet, falls back to the individual
+    reads. Each part is cached separately, so a write only refetches what
+    it touched.
+    """
+    parts = tuple(p for p in BUNDLE_PARTS if p in parts)
+    bundle = _cached_bundle(user_name, history_limit, parts)
+    wanted = tuple(p for p in _bundle_keys(user_name, history_limit, parts) if p not in bundle)
+    if not wanted:
+        annotate(cached=True)
+        return _with_defaults(bundle, parts)
+    generation = get_read_cache().generation
+    try:
+        with supabase_client() as sb:
+            resp = sb.rpc(
+                "get_user_bundle",
+                {"p_user_name": user_name, "p_history_limit": history_limit, "p_parts": list(wanted)},
+            ).execute()
+        data = resp.data or {}
+        loaded = {part: data.get(part) for part in wanted}
+    except Exception as e:
+        record_error(e)
+        loaders = {
+            "user_names": get_all_user_names,
+            "profile": lambda: get_physical_profile(user_name),
+            "equipment": lambda: get_equipment(user_name),
+            "food_preferences": lambda: get_food_preferences(user_name),
+            "history": lambda: get_recommendation_history(user_name, history_limit),
+        }
+        loaded = {part: loaders[part]() for part in wanted}
+    loaded = _with_defaults(loaded, wanted)
+    _prime_cache(user_name, history_limit, loaded, generation)
+    return _with_defaults({**bundle, **loaded}, parts)
+
+
+def _with_defaults(bundle: dict, parts: tuple) -> dict:
+    """Fill missing or NULL parts: no profile, and empty lists for everything else."""
+    for part in parts:
+        if bundle.get(part) is None:
+            bundle[part] = None if part == "profile" else []
+    return bundle
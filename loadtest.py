@@ -0,0 +1,223 @@
+"""
+Load test for the FitFlow Health App.
+Drives N concurrent simulated sessions (each looping the benchmark journeys
+through AppTest) against the local Supabase and Gemini stand-ins, stepping
+N up until the machine saturates:
+
+    python loadtest.py --sessions 1 2 4 8 16 32 --duration 30 --gemini-latency-ms 300
+
+Each session runs in its own process with its own local backends: AppTest
+instances share Streamlit's global runtime and config, so running them on
+threads of one process fails in ways a real server never would.
+
+For each session count it reports throughput, step latency percentiles,
+app errors and harness errors (the test driver failing, not the app), DB
+round trips and model calls per step, and memory per session, then names
+the saturation point: the first count whose p95 breaks the SLO, whose app
+error rate is too high, or that stops adding throughput.
+"""
+
+import argparse
+import json
+import multiprocessing
+import queue
+import random
+import resource
+import threading
+import time
+
+from benchmark import JOURNEYS, open_app, percentile, reset_backends, run_journey
+from local_backend import GEMINI, STORE
+
+
+def rss_mb() -> float:
+    """Current resident memory of this process in MB (peak, if current isn't available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if peak > 2**24 else peak / 2**10  # Bytes on macOS, KB on Linux
+
+
+class MemorySampler:
+    """Samples RSS in the background and keeps the peak."""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadtest-memory", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+
+def run_session(seed: int, args, ready, start, results):
+    """One simulated session, in its own process: loop random journeys for args.duration seconds."""
+    reset_backends(args)
+    run_journey("warm-up", [open_app], args.timeout)  # A new process's first script run is cold
+    rng = random.Random(seed)
+    samples = []
+    harness_errors = 0
+    round_trips, model_calls = STORE.round_trips, GEMINI.calls  # Seeding isn't part of the load
+    ready.put(seed)
+    start.wait()
+    deadline = time.monotonic() + args.duration
+    with MemorySampler() as memory:
+        while time.monotonic() < deadline:
+            name = rng.choice(args.journeys)
+            try:
+                samples.extend(run_journey(name, JOURNEYS[name], args.timeout))
+            except Exception:
+                harness_errors += 1  # AppTest itself failed to start
+    results.put({
+        "samples": samples,
+        "harness_errors": harness_errors,
+        "round_trips": STORE.round_trips - round_trips,
+        "model_calls": GEMINI.calls - model_calls,
+        "peak_mb": memory.peak,
+    })
+
+
+def _gather(channel, count: int, processes: list, timeout: float) -> list:
+    """Take `count` messages from `channel`, failing fast if a session process died."""
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count:
+        try:
+            messages.append(channel.get(timeout=1.0))
+        except queue.Empty:
+            dead = [p for p in processes if p.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError(f"session process exited with code {dead[0].exitcode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"timed out waiting for {count - len(messages)} sessions")
+    return messages
+
+
+def run_level(sessions: int, args) -> dict:
+    """Run `sessions` concurrent session processes for args.duration seconds and summarize."""
+    context = multiprocessing.get_context("spawn")
+    ready, results, start = context.Queue(), context.Queue(), context.Event()
+    processes = [
+        context.Process(
+            target=run_session, args=(i, args, ready, start, results), name=f"loadtest-session-{i}"
+        )
+        for i in range(sessions)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        _gather(ready, sessions, processes, timeout=args.timeout)  # Imports and warm-up aren't timed
+        started = time.monotonic()
+        start.set()
+        finished = _gather(results, sessions, processes, timeout=args.duration + args.timeout)
+        elapsed = time.monotonic() - started
+    finally:
+        for p in processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+    samples = [s for f in finished for s in f["samples"]]
+    seconds = [s["seconds"] for s in samples] or [0.0]
+    steps = len(samples)
+    app_errors = sum(s["error_kind"] == "app" for s in samples)
+    harness_errors = sum(s["error_kind"] == "harness" for s in samples)
+    harness_errors += sum(f["harness_errors"] for f in finished)
+    return {
+        "sessions": sessions,
+        "steps": steps,
+        "throughput": steps / elapsed,
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+        "error_rate": app_errors / steps if steps else 0.0,
+        "harness_errors": harness_errors,
+        "round_trips_per_step": sum(f["round_trips"] for f in finished) / steps if steps else 0.0,
+        "model_calls_per_step": sum(f["model_calls"] for f in finished) / steps if steps else 0.0,
+        "peak_rss_mb": sum(f["peak_mb"] for f in finished),
+        "mb_per_session": sum(f["peak_mb"] for f in finished) / sessions,
+    }
+
+
+def saturation_reason(level: dict, previous: dict | None, args) -> str | None:
+    """Why this level counts as saturated, or None if the process kept up."""
+    if level["p95_ms"] > args.slo_ms:
+        return f"p95 {level['p95_ms']:.0f} ms > SLO {args.slo_ms:.0f} ms"
+    if level["error_rate"] > args.max_error_rate:
+        return f"error rate {level['error_rate']:.1%} > {args.max_error_rate:.1%}"
+    if previous and level["throughput"] < previous["throughput"] * args.min_scaling:
+        return (
+            f"throughput {level['throughput']:.1f}/s didn't grow past "
+            f"{previous['throughput']:.1f}/s x {args.min_scaling}"
+        )
+    return None
+
+
+def print_level(level: dict):
+    print(
+        f"{level['sessions']:>8}{level['steps']:>7}{level['throughput']:>9.1f}"
+        f"{level['p50_ms']:>9.0f}{level['p95_ms']:>9.0f}{level['p99_ms']:>9.0f}"
+        f"{level['error_rate']:>8.1%}{level['harness_errors']:>9}{level['round_trips_per_step']:>7.1f}"
+        f"{level['model_calls_per_step']:>7.2f}{level['mb_per_session']:>9.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per session count")
+    parser.add_argument("--journeys", nargs="+", choices=sorted(JOURNEYS), default=list(JOURNEYS))
+    parser.add_argument("--db-latency-ms", type=float, default=10.0)
+    parser.add_argument("--gemini-latency-ms", type=float, default=300.0)
+    parser.add_argument("--chunk-delay-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per script run")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="p95 step latency that counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-scaling", type=float, default=1.05,
+                        help="a level must beat the previous throughput by this factor")
+    parser.add_argument("--keep-going", action="store_true", help="run every level even after saturation")
+    parser.add_argument("--json", metavar="PATH", help="also write the results here (to compare releases)")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8}{'steps':>7}{'steps/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errors':>8}{'harness':>9}{'db rt':>7}{'model':>7}{'MB/sess':>9}")
+    levels = []
+    saturation = None
+    for sessions in sorted(args.sessions):
+        level = run_level(sessions, args)
+        print_level(level)
+        reason = saturation_reason(level, levels[-1] if levels else None, args)
+        levels.append(level)
+        if reason and saturation is None:
+            saturation = {"sessions": sessions, "reason": reason}
+            if not args.keep_going:
+                break
+
+    harness_errors = sum(level["harness_errors"] for level in levels)
+    if harness_errors:
+        print(f"\n{harness_errors} harness errors: the test driver failed, so those levels undercount load.")
+    if saturation:
+        print(f"\nSaturated at {saturation['sessions']} sessions: {saturation['reason']}")
+    else:
+        print(f"\nNo saturation up to {levels[-1]['sessions']} sessions.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": vars(args), "levels": levels, "saturation": saturation}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""
+Local in-memory stand-ins for the Supabase client and Gemini model used by
+the FitFlow Health App.
+
+Set SUPABASE_URL = "local://" to run the app, benchmarks, or pool experiments
+without a Supabase project. It supports the slice of the supabase-py query
+builder that db.py uses and counts every round trip so tests can assert on it.
+
+Set GEMINI_API_KEY = "local://" to answer prompts with canned responses
+instead of calling Gemini, with configurable latency and injected 429s.
+"""
+
+import copy
+import itertools
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class LocalResponse:
+    """Mimics the APIResponse object returned by postgrest `execute()`."""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class LocalStore:
+    """Process-wide tables shared by every LocalSupabaseClient."""
+
+    TABLES = (
+        "physical_profile",
+        "equipment_inventory",
+        "food_preferences",
+        "recommendation_history",
+    )
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """Drop all rows and zero the counters."""
+        with self.lock:
+            self.tables = {name: [] for name in self.TABLES}
+            self._ids = {name: itertools.count(1) for name in self.TABLES}
+            self.round_trips = 0
+            self.clients_created = 0
+            self.latency_s = 0.0
+
+    def next_id(self, table: str) -> int:
+        return next(self._ids[table])
+
+    def round_trip(self):
+        """Record one network round trip and simulate its latency."""
+        with self.lock:
+            self.round_trips += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+
+STORE = LocalStore()
+
+# Unique constraints from setup.sql, enforced on insert and update.
+UNIQUE_KEYS = {"physical_profile": "user_name"}
+
+
+def _check_unique(table: str, rows: list[dict]):
+    column = UNIQUE_KEYS.get(table)
+    if column is None:
+        return
+    values = [r.get(column) for r in rows]
+    if len(values) != len(set(values)):
+        raise ValueError(
+            f'duplicate key value violates unique constraint "{table}_{column}_key"'
+        )
+
+
+def _prepare_row(table: str, row: dict) -> dict:
+    """Fill server-side defaults the way Postgres would."""
+    row = {k: (_now_iso() if v == "now()" else v) for k, v in row.items()}
+    if "id" not in row:
+        row["id"] = STORE.next_id(table)
+    if table == "recommendation_history":
+        row.setdefault("created_at", _now_iso())
+        # Generated columns from setup.sql
+        for kind in ("workout", "dinner"):
+            text = row.get(kind)
+            row[f"{kind}_preview"] = text[:120] if text is not None else None
+    if table == "physical_profile":
+        row.setdefault("updated_at", _now_iso())
+    return row
+
+
+class LocalQuery:
+    """A chainable query against one local table."""
+
+    def __init__(self, client: "LocalSupabaseClient", table: str):
+        self._client = client
+        self._table = table
+        self._action = "select"
+        self._columns = None
+        self._payload = None
+        self._filters = []
+        self._order = None
+        self._limit = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+
+    # ── Builders ──
+
+    def select(self, columns: str = "*"):
+        self._action = "select"
+        cols = [c.strip() for c in columns.split(",")]
+        self._columns = None if "*" in cols else cols
+        return self
+
+    def insert(self, rows):
+        self._action = "insert"
+        self._payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id", ignore_duplicates: bool = False):
+        self._action = "upsert"
+        self._payload = rows
+        self._on_conflict = [c.strip() for c in on_conflict.split(",")]
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, values: dict):
+        self._action = "update"
+        self._payload = values
+        return self
+
+    def delete(self):
+        self._action = "delete"
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column: str, values):
+        values = list(values)
+        self._filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order = (column, desc)
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    # ── Execution ──
+
+    def _matches(self, row: dict) -> bool:
+        return all(f(row) for f in self._filters)
+
+    def _project(self, row: dict) -> dict:
+        if self._columns is None:
+            return copy.deepcopy(row)
+        return {c: copy.deepcopy(row.get(c)) for c in self._columns}
+
+    def execute(self) -> LocalResponse:
+        self._client._check_open()
+        STORE.round_trip()
+        with STORE.lock:
+            rows = STORE.tables[self._table]
+            handler = getattr(self, f"_execute_{self._action}")
+            return LocalResponse(handler(rows))
+
+    def _execute_select(self, rows):
+        found = [r for r in rows if self._matches(r)]
+        if self._order:
+            column, desc = self._order
+            found.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+        if self._limit is not None:
+            found = found[: self._limit]
+        return [self._project(r) for r in found]
+
+    def _execute_insert(self, rows):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        created = [_prepare_row(self._table, dict(p)) for p in payload]
+        _check_unique(self._table, rows + created)
+        rows.extend(created)
+        return copy.deepcopy(created)
+
+    def _execute_upsert(self, rows):
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        written = []
+        for p in payload:
+            key = tuple(p.get(c) for c in self._on_conflict)
+            existing = next(
+                (r for r in rows if tuple(r.get(c) for c in self._on_conflict) == key),
+                None,
+            )
+            if existing is None:
+                row = _prepare_row(self._table, dict(p))
+                rows.append(row)
+                written.append(row)
+            elif not self._ignore_duplicates:
+                existing.update(_prepare_row(self._table, {"id": existing["id"], **p}))
+                written.append(existing)
+        return copy.deepcopy(written)
+
+    def _execute_update(self, rows):
+        values = {k: (_now_iso() if v == "now()" else v) for k, v in self._payload.items()}
+        changed = [r for r in rows if self._matches(r)]
+        updated = [{**r, **values} if self._matches(r) else r for r in rows]
+        _check_unique(self._table, updated)
+        for r in changed:
+            r.update(values)
+        return copy.deepcopy(changed)
+
+    def _execute_delete(self, rows):
+        removed = [r for r in rows if self._matches(r)]
+        rows[:] = [r for r in rows if not self._matches(r)]
+        return removed
+
+
+# ─── Server-side functions (mirrors of setup.sql) ─────────────────────
+
+RPC_FUNCTIONS = {}
+
+
+def _rpc(name: str):
+    """Register a Python mirror of a Postgres function defined in setup.sql."""
+    def decorator(fn):
+        RPC_FUNCTIONS[name] = fn
+        return fn
+    return decorator
+
+
+def _rows_for(tables: dict, table: str, user_name: str) -> list[dict]:
+    return [r for r in tables[table] if r.get("user_name") == user_name]
+
+
+# History columns returned by get_user_bundle in setup.sql
+BUNDLE_HISTORY_COLUMNS = (
+    "created_at",
+    "workout_summary",
+    "dinner_summary",
+    "workout_preview",
+    "dinner_preview",
+)
+
+
+@_rpc("get_user_bundle")
+def _get_user_bundle(
+    tables: dict, p_user_name: str | None, p_history_limit: int = 7, p_parts: list[str] | None = None
+) -> dict:
+    def history():
+        rows = sorted(
+            _rows_for(tables, "recommendation_history", p_user_name),
+            key=lambda r: r["created_at"],
+            reverse=True,
+        )
+        return [{k: r.get(k) for k in BUNDLE_HISTORY_COLUMNS} for r in rows[:p_history_limit]]
+
+    def profile():
+        profiles = _rows_for(tables, "physical_profile", p_user_name)
+        return profiles[0] if profiles else None
+
+    parts = {
+        "user_names": lambda: sorted({r["user_name"] for r in tables["physical_profile"]}),
+        "profile": profile,
+        "equipment": lambda: sorted(_rows_for(tables, "equipment_inventory", p_user_name), key=lambda r: r["id"]),
+        "food_preferences": lambda: sorted(_rows_for(tables, "food_preferences", p_user_name), key=lambda r: r["id"]),
+        "history": history,
+    }
+    # Like the SQL version, parts that weren't asked for come back as null
+    return {
+        name: load() if p_parts is None or name in p_parts else None
+        for name, load in parts.items()
+    }
+
+
+@_rpc("rename_user")
+def _rename_user(tables: dict, p_old_name: str, p_new_name: str) -> None:
+    # Validate before touching anything so a failure renames nothing
+    profiles = [r["user_name"] for r in tables["physical_profile"] if r["user_name"] != p_old_name]
+    _check_unique("physical_profile", [{"user_name": n} for n in profiles + [p_new_name]])
+    for table in tables.values():
+        for row in table:
+            if row.get("user_name") == p_old_name:
+                row["user_name"] = p_new_name
+    return None
+
+
+class LocalRpc:
+    """A pending call to a registered local function."""
+
+    def __init__(self, client: "LocalSupabaseClient", fn, params: dict):
+        self._client = client
+        self._fn = fn
+        self._params = params
+
+    def execute(self) -> LocalResponse:
+        self._client._check_open()
+        STORE.round_trip()
+        with STORE.lock:
+            return LocalResponse(copy.deepcopy(self._fn(STORE.tables, **self._params)))
+
+
+class LocalSupabaseClient:
+    """Drop-in replacement for `supabase.Client` backed by the shared STORE."""
+
+    def __init__(self, url: str = "local://", key: str = ""):
+        self.url = url
+        self.closed = False
+        with STORE.lock:
+            STORE.clients_created += 1
+
+    def _check_open(self):
+        if self.closed:
+            raise ConnectionError("local Supabase client is closed")
+
+    def table(self, name: str) -> LocalQuery:
+        if name not in STORE.tables:
+            raise KeyError(f"relation \"{name}\" does not exist")
+        return LocalQuery(self, name)
+
+    def rpc(self, name: str, params: dict | None = None) -> LocalRpc:
+        if name not in RPC_FUNCTIONS:
+            raise KeyError(f"Could not find the function public.{name}")
+        return LocalRpc(self, RPC_FUNCTIONS[name], params or {})
+
+    def close(self):
+        """Simulate a dropped connection; later queries raise ConnectionError."""
+        self.closed = True
+
+
+# ─── Local Gemini ────────────────────────────────────────────────────
+
+class LocalGeminiError(Exception):
+    """Raised in place of google.api_core's ResourceExhausted."""
+
+
+class LocalGemini:
+    """Process-wide settings and counters shared by every LocalGeminiModel.
+
+    latency_s is the wait before the first chunk; chunk_delay_s is the wait
+    between chunks; rate_limit_rate is the chance a call fails with a 429.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Zero the counters and restore the default (instant, no 429s) behavior."""
+        with self.lock:
+            self.calls = 0
+            self.rate_limited = 0
+            self.latency_s = 0.0
+            self.chunk_delay_s = 0.0
+            self.rate_limit_rate = 0.0
+            self.rng = random.Random(0)
+
+    def call(self) -> bool:
+        """Record one model call; return True if it should be rate limited."""
+        with self.lock:
+            self.calls += 1
+            limited = self.rng.random() < self.rate_limit_rate
+            self.rate_limited += limited
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return limited
+
+
+GEMINI = LocalGemini()
+
+_EXERCISES = [
+    "Goblet squat", "Push-ups", "Plank", "Reverse lunges", "Glute bridge", "Bent-over row",
+    "Mountain climbers", "Dead bug", "Jump rope", "Lateral raise", "Step-ups", "Bird dog",
+    "Burpees", "Russian twist", "Wall sit", "Shoulder press", "Hip hinge", "Bear crawl",
+]
+_DINNERS = [
+    "Lemon pepper grilled chicken with cilantro lime rice and roasted garlic asparagus",
+    "Miso-glazed salmon with sesame bok choy and jasmine rice",
+    "Turkey taco lettuce wraps with chipotle black beans and fresh salsa",
+    "Chickpea coconut curry with spinach and warm naan",
+    "Greek chicken bowls with tzatziki, cucumber, and herbed quinoa",
+    "Shrimp stir-fry with snap peas, peppers, and brown rice noodles",
+]
+
+
+def _local_response(contents: str, system_instruction: str, rng: random.Random) -> str:
+    """A canned markdown answer shaped like the real one for each prompt kind."""
+    text = f"{system_instruction}\n{contents}"
+    if "full recipe for this dinner" in text:
+        return (
+            "### Ingredients\n- 2 chicken breasts\n- 1 cup rice\n- 1 lemon\n\n"
+            "### Instructions\n1. Season and grill the chicken.\n2. Cook the rice.\n\n"
+            "**Cook time:** 30 minutes\n\n**Tip:** Rest the chicken 5 minutes before slicing."
+        )
+    if "AVAILABLE EQUIPMENT" in text:
+        moves = rng.sample(_EXERCISES, 5)
+        return "## Today's 45-Minute Workout\n\n" + "\n".join(
+            f"- **{move}**: 3 x 12, keep your core tight" for move in moves
+        )
+    if "FOOD PREFERENCES" in text:
+        return f"**Tonight's fuel:** {rng.choice(_DINNERS)}.\n\nWould you like the full recipe?"
+    return (
+        "Rough days happen, and that's completely normal.\n\n"
+        "- **Take a 10-minute walk**\n- **Drink a glass of water**\n- **Stretch for 5 minutes**\n\n"
+        "Tomorrow's a new shot at it."
+    )
+
+
+class LocalChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class LocalGeminiModel:
+    """Drop-in replacement for `genai.GenerativeModel` backed by GEMINI."""
+
+    def __init__(self, model_name: str = "local", generation_config=None, system_instruction: str = ""):
+        self.model_name = model_name
+        self.system_instruction = system_instruction or ""
+
+    def generate_content(self, contents, stream: bool = False):
+        if GEMINI.call():
+            raise LocalGeminiError("429 Resource has been exhausted (e.g. check quota).")
+        with GEMINI.lock:
+            text = _local_response(str(contents), self.system_instruction, GEMINI.rng)
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)]
+        if not stream:
+            return LocalChunk(text)
+        return self._stream(chunks)
+
+    def _stream(self, chunks):
+        for chunk in chunks:
+            if GEMINI.chunk_delay_s:
+                time.sleep(GEMINI.chunk_delay_s)
+            yield LocalChunk(chunk)
@@ -0,0 +1,167 @@
+"""
+Background recommendation prefetcher for the FitFlow Health App.
+Keeps a small buffer of ready-made workouts and dinners for every configured
+user, generated during idle time with spare Gemini quota, so clicking
+"Generate" can return instantly.
+"""
+
+import threading
+from collections import deque
+
+from ai import (
+    StreamError,
+    RateLimiter,
+    get_dinner_recommendation,
+    get_rate_limiter,
+    get_workout_recommendation,
+    recommendation_key,
+)
+from db import get_all_user_names, get_user_bundle, on_user_data_change, user_is_configured
+from settings import get_setting, process_wide
+from similarity import looks_like_repeat
+
+KINDS = ("workout", "dinner")
+
+# The db kinds each recommendation depends on (history affects both)
+DEPENDS_ON = {
+    "workout": {"profile", "equipment", "history"},
+    "dinner": {"profile", "food_preferences", "history"},
+}
+
+
+class Prefetcher:
+    """A daemon thread that keeps `buffer_size` fresh results per user and kind.
+
+    Each buffered result remembers the recommendation_key it was made from,
+    so a result is only handed out if the user's profile, equipment, food
+    preferences and history are unchanged. Writes through db.py also drop
+    the affected buffers right away. It only generates while `limiter` (the
+    one clicks go through) has spare tokens beyond `reserve`.
+    """
+
+    def __init__(self, limiter: RateLimiter, buffer_size: int = 2, reserve: int = 1, interval: float = 10.0):
+        self.limiter = limiter
+        self.buffer_size = buffer_size
+        self.reserve = reserve
+        self.interval = interval
+        self._buffers = {}  # (user_name, kind) -> deque of (key, text)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fitflow-prefetch", daemon=True)
+        self.generated = 0
+        self.served = 0
+        self.discarded = 0
+
+    def start(self):
+        on_user_data_change(self.invalidate)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    # ── Buffer access ──
+
+    def take(self, user_name: str, kind: str, key: str) -> str | None:
+        """Pop a ready result made from inputs matching `key`, if any."""
+        with self._lock:
+            buffer = self._buffers.get((user_name, kind))
+            while buffer:
+                item_key, text = buffer.popleft()
+                if item_key == key:
+                    self.served += 1
+                    self._wake.set()  # Refill what we just handed out
+                    return text
+                self.discarded += 1
+        return None
+
+    def invalidate(self, user_name: str | None, kinds):
+        """Drop buffers whose inputs just changed (db.py write listener)."""
+        with self._lock:
+            for (buffered_user, kind), buffer in self._buffers.items():
+                if user_name in (None, buffered_user) and DEPENDS_ON[kind] & set(kinds):
+                    self.discarded += len(buffer)
+                    buffer.clear()
+        self._wake.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = sum(len(b) for b in self._buffers.values())
+        return {
+            "buffered": buffered,
+            "generated": self.generated,
+            "served": self.served,
+            "discarded": self.discarded,
+        }
+
+    # ── Worker ──
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(timeout=self.interval)
+            self._wake.clear()
+            try:
+                # Keep going while there is work and spare quota
+                while not self._stopped.is_set() and self._fill_one():
+                    pass
+            except Exception:
+                pass  # Never let a background failure kill the worker
+
+    def _fill_one(self) -> bool:
+        """Generate one missing result. Returns False if there's nothing to do now."""
+        for user_name in get_all_user_names():
+            bundle = get_user_bundle(user_name)
+            profile = bundle["profile"]
+            if not user_is_configured(profile):
+                continue
+            for kind in KINDS:
+                items = bundle["equipment"] if kind == "workout" else bundle["food_preferences"]
+                key = recommendation_key(kind, profile, items, bundle["history"])
+                with self._lock:
+                    buffer = self._buffers.setdefault((user_name, kind), deque())
+                    if len(buffer) >= self.buffer_size:
+                        continue
+                if not self.limiter.has_idle_capacity(self.reserve):
+                    return False
+                generate = get_workout_recommendation if kind == "workout" else get_dinner_recommendation
+                text = generate(profile, items, bundle["history"], fresh=True)
+                if not isinstance(text, StreamError) and looks_like_repeat(
+                    user_name, kind, text, bundle["history"]
+                ):
+                    text = generate(profile, items, bundle["history"], fresh=True)  # One retry
+                if isinstance(text, StreamError) or looks_like_repeat(
+                    user_name, kind, text, bundle["history"]
+                ):
+                    return False  # Back off until the next interval
+                with self._lock:
+                    buffer.append((key, text))
+                    self.generated += 1
+                return True
+        return False
+
+
+@process_wide
+def get_prefetcher() -> Prefetcher | None:
+    """Start the process-wide prefetcher if PREFETCH_ENABLED is on (off by default).
+
+    It spends real Gemini quota on every configured user, so it's opt-in.
+    """
+    if not get_setting("PREFETCH_ENABLED", False, bool):
+        return None
+    prefetcher = Prefetcher(
+        get_rate_limiter(),
+        buffer_size=get_setting("PREFETCH_BUFFER_SIZE", 2, int),
+        reserve=get_setting("PREFETCH_RESERVE_TOKENS", 1, int),
+        interval=get_setting("PREFETCH_INTERVAL_SECONDS", 10.0, float),
+    )
+    prefetcher.start()
+    return prefetcher
+
+
+def take_prefetched(user_name: str, kind: str, profile: dict, items: list[dict], history: list[dict]) -> str | None:
+    """Return a prefetched workout or dinner for exactly these inputs, or None."""
+    prefetcher = get_prefetcher()
+    if prefetcher is None:
+        return None
+    return prefetcher.take(user_name, kind, recommendation_key(kind, profile, items, history))
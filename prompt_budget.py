@@ -0,0 +1,100 @@
+"""
+Prompt token budgeting for the FitFlow Health App.
+Counts tokens locally (no API call), and shrinks a prompt one compaction
+step at a time — fewer history rows, then no item notes, then grouped
+lists — until it fits the per-prompt budget.
+"""
+
+import math
+import re
+import threading
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    """Estimate Gemini's token count: ~4 characters per word piece, 1 per symbol.
+
+    Tends to slightly over-count English prose, which is the safe side for
+    a budget.
+    """
+    return sum(
+        math.ceil(len(piece) / 4) if piece[0].isalnum() or piece[0] == "_" else 1
+        for piece in _TOKEN.findall(text or "")
+    )
+
+
+class Prompt(str):
+    """Prompt text that carries its token count and the compactions applied."""
+
+    tokens: int
+    compactions: tuple[str, ...]
+    over_budget: bool
+
+
+def fit_to_budget(render, steps, budget: int | None) -> Prompt:
+    """Render a prompt, applying compaction steps in order until it fits.
+
+    `render(**options)` builds the prompt text; `steps` is an ordered list of
+    (name, options) pairs, each layered on the ones before it. If every step
+    is applied and the prompt is still too long it's sent anyway, flagged
+    over_budget — we never cut allergies or medical notes to save tokens.
+    """
+    options = {}
+    applied = []
+    text = render()
+    tokens = count_tokens(text)
+    for name, change in steps:
+        if not budget or tokens <= budget:
+            break
+        options.update(change)
+        applied.append(name)
+        text = render(**options)
+        tokens = count_tokens(text)
+    prompt = Prompt(text)
+    prompt.tokens = tokens
+    prompt.compactions = tuple(applied)
+    prompt.over_budget = bool(budget) and tokens > budget
+    return prompt
+
+
+def history_steps(history: list[dict], floor: int = 0) -> list[tuple[str, dict]]:
+    """Steps that halve the history rows shown, down to `floor`."""
+    steps = []
+    rows = len(history)
+    while rows > floor:
+        rows = max(floor, rows // 2)
+        steps.append((f"history:{rows}", {"history_rows": rows}))
+    return steps
+
+
+def group_items(items: list[dict], name_key: str, group_key: str) -> str:
+    """One line per group, e.g. "  - Free weights: Dumbbells, Kettlebell"."""
+    groups = {}
+    for item in items:
+        groups.setdefault(item.get(group_key) or "Other", []).append(item[name_key])
+    return "\n".join(f"  - {group}: {', '.join(names)}" for group, names in groups.items())
+
+
+class PromptStats:
+    """Running token counts of the prompts sent, by kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds = {}
+
+    def record(self, kind: str, prompt: str):
+        tokens = getattr(prompt, "tokens", None) or count_tokens(prompt)
+        with self._lock:
+            entry = self._kinds.setdefault(
+                kind, {"prompts": 0, "tokens": 0, "max_tokens": 0, "last_tokens": 0, "compacted": 0}
+            )
+            entry["prompts"] += 1
+            entry["tokens"] += tokens
+            entry["last_tokens"] = tokens
+            entry["max_tokens"] = max(entry["max_tokens"], tokens)
+            entry["compacted"] += bool(getattr(prompt, "compactions", ()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {kind: dict(entry) for kind, entry in self._kinds.items()}
@@ -0,0 +1,97 @@
+"""
+Persistent Gemini response cache for the FitFlow Health App.
+Responses are keyed by a hash of the normalized prompt and model settings,
+expire after a per-kind TTL, and are evicted least-recently-used first once
+the cache is full. Stored in SQLite so it survives app restarts.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Seconds a cached response stays valid, by kind. 0 disables caching.
+DEFAULT_TTLS = {
+    "workout": 6 * 3600,
+    "dinner": 6 * 3600,
+    "recipe": 30 * 24 * 3600,
+    "vibe": 0,  # Pep talks should feel personal, not replayed
+}
+
+
+def prompt_fingerprint(kind: str, model_key: str, prompt: str) -> str:
+    """Hash a prompt so whitespace and case differences map to the same key."""
+    normalized = re.sub(r"\s+", " ", prompt).strip().lower()
+    return hashlib.sha256(f"{kind}\0{model_key}\0{normalized}".encode()).hexdigest()
+
+
+class ResponseCache:
+    """A size-bounded, TTL-aware LRU cache of response text backed by SQLite."""
+
+    def __init__(self, path: str, max_entries: int = 2000, ttls: dict | None = None):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, kind TEXT, text TEXT,"
+            " created_at REAL, last_used REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, kind: str) -> str | None:
+        """Return the cached text if present and fresh, else None."""
+        ttl = self.ttls.get(kind, 0)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > ttl:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, kind: str, text: str):
+        """Store a response, then evict the least recently used past max_entries."""
+        if not self.ttls.get(kind, 0):
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, text, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, kind, text, now, now),
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
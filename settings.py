@@ -0,0 +1,59 @@
+"""
+Runtime settings for the FitFlow Health App.
+Values are read from Streamlit secrets first, then from environment variables,
+so the same keys work in Streamlit Cloud, locally, and from headless scripts.
+Also home to `process_wide`, which builds the shared pools, caches and
+limiters once per process.
+"""
+
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+
+def get_setting(name: str, default=None, cast=None):
+    """Return a setting from st.secrets or the environment, or `default`.
+
+    If `cast` is given (e.g. int, float), the raw value is converted with it.
+    """
+    value = None
+    try:
+        if name in st.secrets:
+            value = st.secrets[name]
+    except Exception:
+        pass  # No secrets.toml — fall back to the environment
+    if value is None:
+        value = os.environ.get(name)
+    if value is None:
+        return default
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value) if cast else value
+
+
+def process_wide(fn=None, *, max_entries: int | None = None):
+    """Build `fn`'s result once per process (per distinct arguments) and reuse it.
+
+    Use this instead of st.cache_resource for objects that threads outside a
+    script run share: batch.py, the write executor and the prefetcher. On
+    older Streamlit versions, st.cache_resource called without a script run
+    context builds a new object every time. The oldest entry is dropped once
+    there are more than `max_entries`.
+    """
+    def decorator(fn):
+        entries = OrderedDict()
+        lock = threading.RLock()
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            with lock:
+                if args not in entries:
+                    entries[args] = fn(*args)
+                    if max_entries is not None and len(entries) > max_entries:
+                        entries.popitem(last=False)
+                return entries[args]
+        return wrapper
+    return decorator(fn) if fn else decorator
@@ -15,10 +15,39 @@ CREATE TABLE IF NOT EXISTS recommendation_history (
     dinner TEXT
 );
 
+-- Recent-history lookups filter by user and sort newest first.
+CREATE INDEX IF NOT EXISTS recommendation_history_user_recent_idx
+    ON recommendation_history (user_name, created_at DESC);
+
+-- Short previews — all the prompts need — so renders don't fetch full markdown.
+ALTER TABLE recommendation_history
+    ADD COLUMN IF NOT EXISTS workout_preview TEXT GENERATED ALWAYS AS (left(workout, 120)) STORED,
+    ADD COLUMN IF NOT EXISTS dinner_preview TEXT GENERATED ALWAYS AS (left(dinner, 120)) STORED;
+
+-- Compact structured summaries written at save time (see summaries.py):
+-- workout_summary = {exercises, fingerprint}
+-- dinner_summary  = {title, protein, cuisine, fingerprint}
+ALTER TABLE recommendation_history
+    ADD COLUMN IF NOT EXISTS workout_summary JSONB,
+    ADD COLUMN IF NOT EXISTS dinner_summary JSONB;
+
+-- One profile per user. This lets upsert_physical_profile() use a single
+-- INSERT ... ON CONFLICT (user_name) instead of a read followed by a write.
+-- If this fails, remove duplicate user_name rows first.
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint WHERE conname = 'physical_profile_user_name_key'
+    ) THEN
+        ALTER TABLE physical_profile
+            ADD CONSTRAINT physical_profile_user_name_key UNIQUE (user_name);
+    END IF;
+END $$;
+
 -- Seed Ashley's profile (update if already exists)
 INSERT INTO physical_profile (age, height_in, weight_lbs, medical_notes, user_name)
 VALUES (44, 63, 111, 'Weight maintenance, increasing health and stamina. Harrington rods in back — avoid high-impact spinal compression.', 'Ashley')
-ON CONFLICT DO NOTHING;
+ON CONFLICT (user_name) DO NOTHING;
 
 -- Seed placeholder users
 INSERT INTO physical_profile (age, height_in, weight_lbs, medical_notes, user_name)
@@ -27,4 +56,67 @@ VALUES
     (0, 0, 0, '', 'User B'),
     (0, 0, 0, '', 'User C'),
     (0, 0, 0, '', 'User D')
-ON CONFLICT DO NOTHING;
+ON CONFLICT (user_name) DO NOTHING;
+
+-- Per-render bundle: everything one page render (or one view) needs in a
+-- single round trip. Returns the list of user names plus the selected user's
+-- profile, equipment, food preferences, and recent history as one JSON
+-- object. p_parts limits which of those are queried (NULL = all of them).
+DROP FUNCTION IF EXISTS get_user_bundle(TEXT, INT);
+CREATE OR REPLACE FUNCTION get_user_bundle(
+    p_user_name TEXT,
+    p_history_limit INT DEFAULT 7,
+    p_parts TEXT[] DEFAULT NULL
+)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'user_names', CASE WHEN p_parts IS NULL OR 'user_names' = ANY(p_parts) THEN COALESCE(
+            (SELECT json_agg(DISTINCT user_name ORDER BY user_name) FROM physical_profile),
+            '[]'::json
+        ) END,
+        'profile', CASE WHEN p_parts IS NULL OR 'profile' = ANY(p_parts) THEN (
+            SELECT row_to_json(p) FROM physical_profile p
+            WHERE p.user_name = p_user_name
+            LIMIT 1
+        ) END,
+        'equipment', CASE WHEN p_parts IS NULL OR 'equipment' = ANY(p_parts) THEN COALESCE(
+            (SELECT json_agg(e ORDER BY e.id) FROM equipment_inventory e
+             WHERE e.user_name = p_user_name),
+            '[]'::json
+        ) END,
+        'food_preferences', CASE WHEN p_parts IS NULL OR 'food_preferences' = ANY(p_parts) THEN COALESCE(
+            (SELECT json_agg(f ORDER BY f.id) FROM food_preferences f
+             WHERE f.user_name = p_user_name),
+            '[]'::json
+        ) END,
+        'history', CASE WHEN p_parts IS NULL OR 'history' = ANY(p_parts) THEN COALESCE(
+            (SELECT json_agg(h ORDER BY h.created_at DESC) FROM (
+                SELECT created_at, workout_summary, dinner_summary,
+                       workout_preview, dinner_preview
+                FROM recommendation_history
+                WHERE user_name = p_user_name
+                ORDER BY created_at DESC
+                LIMIT p_history_limit
+            ) h),
+            '[]'::json
+        ) END
+    );
+$$;
+
+-- Rename a user across every table in one call. A function body runs in a
+-- single transaction, so if any UPDATE fails (e.g. the new name is already
+-- taken) nothing is renamed.
+CREATE OR REPLACE FUNCTION rename_user(p_old_name TEXT, p_new_name TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE physical_profile SET user_name = p_new_name WHERE user_name = p_old_name;
+    UPDATE equipment_inventory SET user_name = p_new_name WHERE user_name = p_old_name;
+    UPDATE food_preferences SET user_name = p_new_name WHERE user_name = p_old_name;
+    UPDATE recommendation_history SET user_name = p_new_name WHERE user_name = p_old_name;
+END;
+$$;
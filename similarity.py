@@ -0,0 +1,118 @@
+"""
+Local near-duplicate detection for the FitFlow Health App.
+Keeps a small MinHash index of each user's past workouts and dinners in
+memory, so a new recommendation can be scored against history in well
+under a millisecond — no extra Gemini call needed to spot a repeat.
+"""
+
+import random
+import re
+import threading
+import zlib
+from collections import deque
+
+from settings import get_setting, process_wide
+from summaries import is_repeat, summarize
+
+NUM_PERM = 32
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def features(kind: str, summary: dict | None) -> set[str]:
+    """The tokens that identify a recommendation, taken from its summary."""
+    if not summary:
+        return set()
+    if kind == "workout":
+        names = summary.get("exercises") or []
+        return set(names) | {w for n in names for w in re.findall(r"[a-z]+", n)}
+    words = set(re.findall(r"[a-z']+", (summary.get("title") or "").lower()))
+    tags = {f"{tag}:{summary[tag]}" for tag in ("protein", "cuisine") if summary.get(tag)}
+    return words | tags
+
+
+def signature(tokens: set[str]) -> tuple[int, ...] | None:
+    """MinHash signature of a token set (None for an empty set)."""
+    if not tokens:
+        return None
+    # crc32, not hash(): str hashes change per process (PYTHONHASHSEED), and
+    # signatures must match between the app, batch.py and across restarts
+    hashes = [zlib.crc32(t.encode()) for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def estimate_similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity: the share of matching MinHash slots."""
+    if sig_a is None or sig_b is None:
+        return 0.0
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class SimilarityIndex:
+    """Per-user, per-kind MinHash signatures of recent recommendations."""
+
+    def __init__(self, max_per_user: int = 50):
+        self.max_per_user = max_per_user
+        self._signatures = {}  # (user_name, kind) -> deque of signatures
+        self._lock = threading.Lock()
+
+    def _load(self, user_name: str, kind: str, history: list[dict]) -> deque:
+        """Build a user's signatures from history rows the first time they're needed."""
+        key = (user_name, kind)
+        with self._lock:
+            if key not in self._signatures:
+                sigs = (signature(features(kind, row.get(f"{kind}_summary"))) for row in history)
+                self._signatures[key] = deque(
+                    (s for s in sigs if s is not None), maxlen=self.max_per_user
+                )
+            return self._signatures[key]
+
+    def add(self, user_name: str, kind: str, summary: dict):
+        """Index a newly saved recommendation (no-op until the user is loaded)."""
+        sig = signature(features(kind, summary))
+        with self._lock:
+            if sig is not None and (user_name, kind) in self._signatures:
+                self._signatures[(user_name, kind)].append(sig)
+
+    def rename(self, old_name: str, new_name: str):
+        """Move a user's signatures to their new name (see db.rename_user)."""
+        with self._lock:
+            for user_name, kind in list(self._signatures):
+                if user_name == old_name:
+                    self._signatures[(new_name, kind)] = self._signatures.pop((user_name, kind))
+
+    def clear(self):
+        with self._lock:
+            self._signatures.clear()
+
+    def score(self, user_name: str, kind: str, text: str, history: list[dict]) -> float:
+        """Highest estimated similarity between `text` and the user's history."""
+        sigs = self._load(user_name, kind, history)
+        sig = signature(features(kind, summarize(kind, text)))
+        return max((estimate_similarity(sig, s) for s in list(sigs)), default=0.0)
+
+
+@process_wide
+def get_similarity_index() -> SimilarityIndex:
+    """Return the process-wide similarity index."""
+    return SimilarityIndex()
+
+
+def similarity_threshold() -> float:
+    """Scores at or above this count as a repeat (SIMILARITY_THRESHOLD, default 0.6)."""
+    return get_setting("SIMILARITY_THRESHOLD", 0.6, float)
+
+
+def repeat_score(user_name: str, kind: str, text: str, history: list[dict]) -> float:
+    """Score a new workout or dinner against the user's saved history.
+
+    An exact fingerprint match scores 1.0 without touching the MinHash index.
+    """
+    if is_repeat(kind, text, history):
+        return 1.0
+    return get_similarity_index().score(user_name, kind, text, history)
+
+
+def looks_like_repeat(user_name: str, kind: str, text: str, history: list[dict]) -> bool:
+    return repeat_score(user_name, kind, text, history) >= similarity_threshold()
@@ -0,0 +1,136 @@
+"""
+Compact summaries of Gemini recommendations for the FitFlow Health App.
+Turns a generated workout or dinner (markdown) into a small structured
+summary when it's saved to history: the exercise list, or the dish, main
+protein and cuisine, plus a fingerprint for spotting repeats locally.
+"""
+
+import hashlib
+import re
+
+MAX_EXERCISES = 12
+
+PROTEINS = [
+    "chicken", "turkey", "beef", "steak", "pork", "lamb", "bison",
+    "salmon", "tuna", "cod", "tilapia", "halibut", "trout", "shrimp", "scallops", "fish",
+    "tofu", "tempeh", "seitan", "eggs", "egg", "lentils", "chickpeas", "beans", "edamame",
+]
+
+CUISINES = {
+    "mexican": ["taco", "burrito", "enchilada", "fajita", "salsa", "tortilla", "chipotle", "quesadilla"],
+    "italian": ["pasta", "risotto", "pesto", "marinara", "parmesan", "gnocchi", "bruschetta", "caprese"],
+    "asian": ["stir-fry", "stir fry", "teriyaki", "soy", "sesame", "miso", "bok choy", "noodle", "sushi"],
+    "thai": ["thai", "pad ", "lemongrass", "coconut curry", "peanut sauce"],
+    "indian": ["curry", "tikka", "masala", "tandoori", "dal", "garam"],
+    "mediterranean": ["feta", "hummus", "tzatziki", "greek", "falafel", "olive", "za'atar", "shawarma"],
+    "american": ["burger", "bbq", "barbecue", "meatloaf", "mac and cheese", "sloppy"],
+}
+
+STOPWORDS = {
+    "a", "an", "and", "the", "with", "of", "on", "in", "for", "to", "your", "over",
+    "served", "side", "plus", "some", "this", "is", "how", "about",
+}
+
+_LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.*)$")
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+
+def _plain(text: str) -> str:
+    """Strip markdown emphasis/heading markers and collapse whitespace."""
+    text = re.sub(r"[*_#`>]", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def _exercise_name(item: str) -> str | None:
+    """Pull an exercise name out of one markdown list item."""
+    bold = _BOLD.search(item)
+    name = bold.group(1) if bold else re.split(r"[:(–—]| - ", item, maxsplit=1)[0]
+    name = _plain(name).rstrip(":").lower()
+    name = re.sub(r"\b\d+\s*(?:x|sets?|reps?|rounds?|min(?:utes?)?|sec(?:onds?)?|s)\b.*$", "", name).strip()
+    if not name or len(name) > 40 or not re.search(r"[a-z]", name):
+        return None
+    return name
+
+
+def summarize_workout(text: str) -> dict:
+    """Summarize a workout as its list of exercises plus a fingerprint."""
+    exercises = []
+    for line in (text or "").splitlines():
+        match = _LIST_ITEM.match(line)
+        if not match:
+            continue
+        name = _exercise_name(match.group(1))
+        if name and name not in exercises:
+            exercises.append(name)
+        if len(exercises) >= MAX_EXERCISES:
+            break
+    basis = sorted(exercises) or [_plain(text or "")[:120].lower()]
+    return {"exercises": exercises, "fingerprint": _fingerprint(*basis)}
+
+
+def _dish_title(text: str) -> str:
+    """The first real sentence of a dinner suggestion, without markdown."""
+    for line in (text or "").splitlines():
+        line = _plain(line)
+        label, _, rest = line.partition(":")
+        if rest.strip() and len(label) < 30:
+            line = rest.strip()  # "Tonight's fuel: Grilled chicken..." -> the dish
+        if len(line) > 15 and not line.endswith("?"):
+            return re.split(r"(?<=[.!?])\s", line, maxsplit=1)[0][:120]
+    return _plain(text or "")[:120]
+
+
+def summarize_dinner(text: str) -> dict:
+    """Summarize a dinner as its dish, main protein, and cuisine plus a fingerprint."""
+    title = _dish_title(text)
+    haystack = f" {title.lower()} "
+    full = f" {(text or '').lower()} "
+    protein = next((p for p in PROTEINS if f" {p}" in haystack), None)
+    protein = protein or next((p for p in PROTEINS if f" {p}" in full), None)
+    cuisine = next(
+        (c for c, cues in CUISINES.items() if any(cue in haystack for cue in cues)), None
+    )
+    key_words = [w for w in re.findall(r"[a-z']+", title.lower()) if w not in STOPWORDS][:6]
+    return {
+        "title": title,
+        "protein": protein,
+        "cuisine": cuisine,
+        "fingerprint": _fingerprint(protein or "", cuisine or "", *sorted(key_words)),
+    }
+
+
+def format_workout_summary(summary: dict | None) -> str:
+    """One compact line for prompts: the exercises, comma separated."""
+    if not summary or not summary.get("exercises"):
+        return ""
+    return ", ".join(summary["exercises"])
+
+
+def format_dinner_summary(summary: dict | None) -> str:
+    """One compact line for prompts: dish, then protein and cuisine if known."""
+    if not summary or not summary.get("title"):
+        return ""
+    tags = [t for t in (summary.get("protein"), summary.get("cuisine")) if t]
+    return summary["title"] + (f" ({', '.join(tags)})" if tags else "")
+
+
+def summarize(kind: str, text: str) -> dict:
+    return summarize_workout(text) if kind == "workout" else summarize_dinner(text)
+
+
+def format_summary(kind: str, summary: dict | None) -> str:
+    if kind == "workout":
+        return format_workout_summary(summary)
+    return format_dinner_summary(summary)
+
+
+def is_repeat(kind: str, text: str, history: list[dict]) -> bool:
+    """True if `text` has the same fingerprint as a summarized history entry."""
+    fingerprint = summarize(kind, text)["fingerprint"]
+    return any(
+        (row.get(f"{kind}_summary") or {}).get("fingerprint") == fingerprint for row in history
+    )
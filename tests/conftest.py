@@ -0,0 +1,8 @@
+"""
+Shared pytest setup: makes the app's top-level modules importable from tests/.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,127 @@
+"""
+Tests for ai.py, run against the local Gemini stand-in.
+Run with: python -m pytest -q
+"""
+
+import os
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "local://")  # Before ai.py builds its model
+os.environ.setdefault("GEMINI_CACHE_PATH", ":memory:")
+os.environ.setdefault("GEMINI_RPM", "6000")
+os.environ.setdefault("GEMINI_BURST", "100")
+
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import ai
+from local_backend import GEMINI, LocalGeminiError
+
+PROFILE = {"user_name": "Ashley", "age": 34, "height_in": 66, "weight_lbs": 150, "medical_notes": ""}
+
+
+@pytest.fixture(autouse=True)
+def local_gemini():
+    GEMINI.reset()
+    yield GEMINI
+    GEMINI.reset()
+
+
+# ─── Rate limiting ───────────────────────────────────────────────────
+
+def test_rate_limiter_serves_callers_in_arrival_order():
+    limiter = ai.RateLimiter(rate_per_minute=600, burst=1)
+    assert limiter.acquire()
+    order = []
+    threads = []
+    for i in range(4):
+        thread = threading.Thread(target=lambda i=i: limiter.acquire() and order.append(i))
+        thread.start()
+        threads.append(thread)
+        while limiter.queue_length() < i + 1:  # Wait until this caller is in line
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    assert order == [0, 1, 2, 3]
+
+
+def test_rate_limiter_penalize_pauses_everyone():
+    limiter = ai.RateLimiter(rate_per_minute=6000, burst=5)
+    limiter.penalize(0.3)
+    assert not limiter.has_idle_capacity(reserve=0)
+    started = time.monotonic()
+    assert limiter.acquire()
+    assert time.monotonic() - started >= 0.25
+
+
+def test_rate_limiter_gives_up_after_timeout_and_leaves_the_line():
+    limiter = ai.RateLimiter(rate_per_minute=1, burst=1)
+    assert limiter.acquire()
+    started = time.monotonic()
+    assert not limiter.acquire(timeout=0.1)
+    assert time.monotonic() - started < 1.0
+    assert limiter.queue_length() == 0
+
+
+@pytest.mark.parametrize("error, expected", [
+    (google_exceptions.ResourceExhausted("Resource has been exhausted (e.g. check quota)."), True),
+    (google_exceptions.TooManyRequests("Too many requests"), True),
+    (LocalGeminiError("429 Resource has been exhausted"), True),
+    (google_exceptions.InvalidArgument("models/gemini:generateContent is not a valid rate"), False),
+    (ValueError("quota field missing"), False),
+])
+def test_is_rate_limit_goes_by_type_not_message(error, expected):
+    assert ai._is_rate_limit(error) is expected
+
+
+def test_backoff_stays_within_its_jitter_range():
+    for attempt in range(5):
+        wait = ai._backoff_seconds(attempt)
+        assert 1.0 <= wait <= 1.0 + min(60.0, 5.0 * 2 ** attempt)
+
+
+def test_fresh_skips_the_response_cache_and_replaces_the_entry(local_gemini):
+    dinner = "Miso-glazed salmon, cached-path test"
+    first = ai.get_recipe_details(dinner, [])
+    assert ai.get_recipe_details(dinner, []) == first
+    assert local_gemini.calls == 1
+    again = ai.get_recipe_details(dinner, [], fresh=True)
+    assert local_gemini.calls == 2
+    assert ai.get_recipe_details(dinner, []) == again
+    assert local_gemini.calls == 2
+
+
+def test_generate_my_day_streams_every_kind():
+    texts = {}
+    for kind, chunk in ai.generate_my_day(PROFILE, [], [], [], ["Low energy"], fresh=True):
+        texts[kind] = "" if chunk is ai.STREAM_RESTART else texts.get(kind, "") + chunk
+    assert set(texts) == {"workout", "dinner", "vibe"}
+    assert all(texts.values())
+
+
+def test_generate_my_day_relays_status_on_the_callers_thread(monkeypatch):
+    caller = threading.current_thread()
+    seen = []
+
+    def fake_stream(profile, items, history, on_status=None, fresh=False):
+        for i in range(20):
+            on_status(f"queued {i}")  # Floods the caller while it reads statuses
+        yield "done"
+
+    monkeypatch.setattr(ai, "stream_workout_recommendation", fake_stream)
+    monkeypatch.setattr(ai, "stream_dinner_recommendation", fake_stream)
+    chunks = list(ai.generate_my_day(
+        PROFILE, [], [], [], on_status=lambda msg: seen.append(threading.current_thread()),
+    ))
+    assert sorted(kind for kind, _ in chunks) == ["dinner", "workout"]
+    assert seen and all(thread is caller for thread in seen)
+
+
+def test_generate_my_day_stops_without_waiting_for_slow_calls(local_gemini):
+    local_gemini.chunk_delay_s = 0.2
+    stream = ai.generate_my_day(PROFILE, [], [], [], fresh=True)
+    next(stream)
+    started = time.monotonic()
+    stream.close()
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,52 @@
+"""
+Tests for batch.py's checkpointed resume, against the local stand-ins.
+Run with: python -m pytest -q
+"""
+
+import json
+import os
+
+os.environ.setdefault("SUPABASE_URL", "local://")  # Before db.py and ai.py read their settings
+os.environ.setdefault("GEMINI_API_KEY", "local://")
+os.environ.setdefault("GEMINI_CACHE_PATH", ":memory:")
+os.environ.setdefault("GEMINI_RPM", "6000")
+os.environ.setdefault("GEMINI_BURST", "100")
+
+import pytest
+
+import batch
+import db
+from local_backend import GEMINI, STORE
+
+
+@pytest.fixture
+def local_run(tmp_path, monkeypatch):
+    STORE.reset()
+    GEMINI.reset()
+    db.get_read_cache().clear()
+    for name in ("Ashley", "Blake", "Casey"):
+        db.upsert_physical_profile(name, 34, 66, 150, "")
+    monkeypatch.setattr(batch, "CHECKPOINT_DIR", str(tmp_path))
+    yield tmp_path / "batch-test.jsonl"
+
+
+def test_resume_skips_done_users_and_a_truncated_last_line(local_run):
+    local_run.write_text('{"user_name": "Ashley", "saved_at": 1.0}\n{"user_name": "Bla')
+    counts = batch.run_batch("test", workers=2, users=["Ashley", "Blake"])
+    assert counts == {"skipped_done": 1, "saved": 1, "not_configured": 0, "failed": 0}
+    assert batch.Checkpoint(str(local_run)).done == {"Ashley", "Blake"}
+    lines = local_run.read_text().splitlines()
+    assert [json.loads(line)["user_name"] for line in lines] == ["Ashley", "Blake"]
+
+
+def test_skipped_done_counts_only_the_selected_users(local_run):
+    batch.Checkpoint(str(local_run)).mark_done(["Ashley", "Blake"])
+    counts = batch.run_batch("test", users=["Ashley", "Casey"])
+    assert counts["skipped_done"] == 1
+    assert counts["saved"] == 1
+
+
+def test_corruption_before_the_last_line_is_an_error(local_run):
+    local_run.write_text('{"user_name": "Ash\n{"user_name": "Blake", "saved_at": 1.0}\n')
+    with pytest.raises(ValueError):
+        batch.Checkpoint(str(local_run))
@@ -0,0 +1,28 @@
+"""
+Checks that every benchmark journey runs to the end against the local stand-ins.
+Run with: python -m pytest -q
+"""
+
+import argparse
+
+import pytest
+
+from benchmark import JOURNEYS, reset_backends, run_journey
+
+SETTINGS = argparse.Namespace(db_latency_ms=0.0, gemini_latency_ms=0.0, chunk_delay_ms=0.0, rate_limit_rate=0.0)
+
+
+@pytest.mark.parametrize("name", sorted(JOURNEYS))
+def test_journey_finishes(name):
+    reset_backends(SETTINGS)
+    samples = run_journey(name, JOURNEYS[name], timeout=60)
+    assert [s["error"] for s in samples] == [None] * len(JOURNEYS[name])
+
+
+def test_every_run_starts_with_a_cold_response_cache():
+    for _ in range(2):
+        reset_backends(SETTINGS)
+        samples = run_journey("get_recipe_cached", JOURNEYS["get_recipe_cached"], timeout=60)
+        model_calls = {s["step"]: s["model_calls"] for s in samples}
+        assert model_calls["get_recipe"] == 1
+        assert model_calls["get_recipe_again"] == 0
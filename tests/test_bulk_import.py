@@ -0,0 +1,58 @@
+"""
+Tests for bulk import parsing.
+Run with: python -m pytest -q
+"""
+
+import io
+
+import pytest
+
+from bulk_import import bulk_text, is_header, one_of, parse_rows
+
+EQUIPMENT = ("name", "category", "notes")
+FOOD = ("item_name", "preference_type", "nutritional_goal")
+
+
+@pytest.mark.parametrize("values, fields", [
+    (["name", "category", "notes"], EQUIPMENT),
+    (["Equipment", "Type"], EQUIPMENT),
+    (["Item Name", "Preference-Type", "nutritional_goal"], FOOD),
+    (["Food", "", "Goal"], FOOD),
+])
+def test_header_rows_are_recognized(values, fields):
+    assert is_header(values, fields)
+
+
+@pytest.mark.parametrize("values, fields", [
+    (["Kettlebell", "strength", ""], EQUIPMENT),
+    (["Name", "Kettlebell"], EQUIPMENT),  # Only the first cell names its field
+    (["Chicken", "staple", "High protein"], FOOD),
+])
+def test_data_rows_are_not_headers(values, fields):
+    assert not is_header(values, fields)
+
+
+def test_parse_rows_skips_the_header_and_pads_missing_values():
+    text = "Equipment, Type, Notes\nKettlebell, strength, 16 kg\nJump rope\n\n"
+    assert parse_rows(text, EQUIPMENT) == [
+        {"name": "Kettlebell", "category": "strength", "notes": "16 kg"},
+        {"name": "Jump rope", "category": "", "notes": ""},
+    ]
+
+
+def test_parse_rows_handles_quoted_commas():
+    text = 'Chicken, staple, "High protein, low fat"'
+    assert parse_rows(text, FOOD) == [
+        {"item_name": "Chicken", "preference_type": "staple", "nutritional_goal": "High protein, low fat"},
+    ]
+
+
+def test_bulk_text_joins_pasted_text_and_an_uploaded_csv():
+    uploaded = io.BytesIO("\ufeffname,category\nRower,cardio\n".encode("utf-8"))
+    rows = parse_rows(bulk_text("Kettlebell, strength", uploaded), EQUIPMENT)
+    assert [r["name"] for r in rows] == ["Kettlebell", "Rower"]
+
+
+def test_one_of_falls_back_to_the_default():
+    assert one_of(" Cardio ", ["strength", "cardio"], "other") == "cardio"
+    assert one_of("yoga", ["strength", "cardio"], "other") == "other"
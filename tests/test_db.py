@@ -0,0 +1,208 @@
+"""
+Tests for the client pool and read cache in db.py.
+Run with: python -m pytest -q
+"""
+
+import os
+import threading
+
+os.environ.setdefault("SUPABASE_URL", "local://")  # Before db.py builds its pool
+
+import pytest
+
+import db
+from db import ClientPool, ReadCache
+from local_backend import STORE
+
+
+class FakeClient:
+    def __init__(self, n: int):
+        self.n = n
+
+
+def make_pool(**kwargs) -> ClientPool:
+    created = iter(range(1000))
+    return ClientPool(factory=lambda: FakeClient(next(created)), **kwargs)
+
+
+# ─── ClientPool ──────────────────────────────────────────────────────
+
+def test_pool_reuses_idle_clients():
+    pool = make_pool(size=2)
+    with pool.acquire() as first:
+        pass
+    with pool.acquire() as second:
+        pass
+    assert second is first
+    assert pool.stats()["created"] == 1
+
+
+def test_pool_health_checks_a_client_that_raised(monkeypatch):
+    pings = []
+    monkeypatch.setattr(db, "_ping", lambda client: pings.append(client) or False)
+    pool = make_pool(size=1, health_check_after=3600)
+    with pytest.raises(RuntimeError):
+        with pool.acquire() as broken:
+            raise RuntimeError("connection reset")
+    with pool.acquire() as client:
+        pass
+    assert pings == [broken]
+    assert client is not broken
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_pool_skips_health_check_for_recently_used_client(monkeypatch):
+    monkeypatch.setattr(db, "_ping", lambda client: pytest.fail("pinged a healthy client"))
+    pool = make_pool(size=1, health_check_after=3600)
+    with pool.acquire():
+        pass
+    with pool.acquire():
+        pass
+
+
+def test_pool_bounds_concurrent_borrowers():
+    pool = make_pool(size=2)
+    inside, peak, lock = [0], [0], threading.Lock()
+    release = threading.Event()
+
+    def borrow():
+        with pool.acquire():
+            with lock:
+                inside[0] += 1
+                peak[0] = max(peak[0], inside[0])
+            release.wait(0.05)
+            with lock:
+                inside[0] -= 1
+
+    threads = [threading.Thread(target=borrow) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 2
+    assert pool.stats()["created"] <= 2
+
+
+# ─── ReadCache ───────────────────────────────────────────────────────
+
+def test_cache_hit_returns_a_copy():
+    cache = ReadCache()
+    cache.put(("equipment", "Ashley"), [{"name": "Kettlebell"}])
+    found, rows = cache.get(("equipment", "Ashley"))
+    rows[0]["name"] = "changed"
+    assert found
+    assert cache.get(("equipment", "Ashley"))[1] == [{"name": "Kettlebell"}]
+
+
+def test_cache_expires_entries():
+    cache = ReadCache(ttl=0.0)
+    cache.put(("profile", "Ashley"), {"age": 34})
+    assert cache.get(("profile", "Ashley")) == (False, None)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ReadCache(max_entries=2)
+    cache.put(("profile", "a"), 1)
+    cache.put(("profile", "b"), 2)
+    cache.get(("profile", "a"))
+    cache.put(("profile", "c"), 3)
+    assert cache.get(("profile", "b")) == (False, None)
+    assert cache.get(("profile", "a")) == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_invalidates_one_user_or_everyone():
+    cache = ReadCache()
+    cache.put(("equipment", "a"), [])
+    cache.put(("equipment", "b"), [])
+    cache.put(("profile", "a"), {})
+    cache.invalidate(("equipment",), "a")
+    assert not cache.get(("equipment", "a"))[0]
+    assert cache.get(("equipment", "b"))[0]
+    assert cache.get(("profile", "a"))[0]
+    cache.invalidate(("equipment",), any_user=True)
+    assert not cache.get(("equipment", "b"))[0]
+
+
+def test_cache_drops_load_that_raced_an_invalidation():
+    cache = ReadCache()
+    key = ("equipment", "Ashley")
+
+    def stale_loader():
+        cache.invalidate(("equipment",), "Ashley")  # A write lands mid-load
+        return ["old row"]
+
+    assert cache.get_or_load(key, stale_loader) == ["old row"]
+    assert cache.get(key) == (False, None)
+    assert cache.get_or_load(key, lambda: ["new row"]) == ["new row"]
+    assert cache.get(key) == (True, ["new row"])
+
+
+# ─── Cached reads ────────────────────────────────────────────────────
+
+@pytest.fixture
+def local_db():
+    STORE.reset()
+    db.get_read_cache().clear()
+    db.seed_default_users()
+    db.upsert_physical_profile("Ashley", 34, 66, 150, "")
+    yield STORE
+
+
+def test_bundle_without_user_has_every_part_on_a_cache_hit(local_db):
+    first = db.get_user_bundle(None)
+    round_trips = local_db.round_trips
+    second = db.get_user_bundle(None)
+    assert local_db.round_trips == round_trips
+    assert second == first
+    assert second["profile"] is None
+    assert set(second) == set(db.BUNDLE_PARTS)
+
+
+def test_cached_getter_accepts_keyword_arguments(local_db):
+    positional = db.get_recommendation_history("Ashley", 3)
+    round_trips = local_db.round_trips
+    assert db.get_recommendation_history("Ashley", limit=3) == positional
+    assert db.get_recommendation_history(user_name="Ashley", limit=3) == positional
+    assert local_db.round_trips == round_trips
+
+
+def test_saved_history_keeps_full_text_and_summary(local_db):
+    workout = "## Today's Workout\n\n- **Goblet squat**: 3 x 12\n- **Plank**: 3 x 30s"
+    dinner = "**Tonight's fuel:** Miso-glazed salmon with bok choy.\n\nWould you like the full recipe?"
+    assert db.save_recommendations([("Ashley", workout, dinner)]) == 1
+    row = local_db.tables["recommendation_history"][0]
+    assert row["workout"] == workout
+    assert row["dinner"] == dinner
+    assert row["workout_summary"]["exercises"]
+    assert row["dinner_summary"]["title"]
+
+
+def test_cached_getter_fills_in_defaults(local_db):
+    db.get_recommendation_history("Ashley")
+    round_trips = local_db.round_trips
+    db.get_recommendation_history("Ashley", db.HISTORY_LIMIT)
+    db.get_user_bundle("Ashley", parts=("history",))
+    assert local_db.round_trips == round_trips
+
+
+def test_seeding_falls_back_when_on_conflict_fails(local_db, monkeypatch):
+    def no_unique_constraint(*args, **kwargs):
+        raise RuntimeError("there is no unique or exclusion constraint matching the ON CONFLICT specification")
+
+    local_db.tables["physical_profile"] = [
+        r for r in local_db.tables["physical_profile"] if r["user_name"] != db.DEFAULT_USERS[-1]
+    ]
+    monkeypatch.setattr(db, "upsert_physical_profiles", no_unique_constraint)
+    assert db.seed_default_users() == [db.DEFAULT_USERS[-1]]
+    assert db.seed_default_users() == []
+    names = [r["user_name"] for r in local_db.tables["physical_profile"]]
+    assert sorted(names) == sorted(set(names))
+
+
+def test_unique_violation_is_told_apart_from_other_failures(local_db):
+    db.upsert_physical_profile("Blake", 40, 70, 180, "")
+    with pytest.raises(Exception) as taken:
+        db.rename_user("Ashley", "Blake")
+    assert db.is_unique_violation(taken.value)
+    assert not db.is_unique_violation(KeyError("Could not find the function public.rename_user"))
@@ -0,0 +1,63 @@
+"""
+Tests for prompt token budgeting.
+Run with: python -m pytest -q
+"""
+
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "local://")  # Before ai.py builds its model
+os.environ.setdefault("GEMINI_CACHE_PATH", ":memory:")
+
+import ai
+from prompt_budget import count_tokens, fit_to_budget, history_steps
+
+PROFILE = {
+    "user_name": "Ashley", "age": 34, "height_in": 66, "weight_lbs": 150,
+    "medical_notes": "Type 1 diabetic; bad left knee",
+}
+FOOD_PREFS = [
+    {"item_name": "Shellfish", "preference_type": "allergy", "nutritional_goal": ""},
+    {"item_name": "Peanuts", "preference_type": "allergy", "nutritional_goal": ""},
+] + [
+    {"item_name": f"Staple {i}", "preference_type": "staple", "nutritional_goal": "High protein, low sugar"}
+    for i in range(20)
+]
+HISTORY = [
+    {"dinner_summary": {"title": f"Grilled chicken bowl number {i} with rice and greens",
+                        "protein": "chicken", "cuisine": None}}
+    for i in range(7)
+]
+
+
+def test_steps_apply_in_order_and_stop_once_it_fits():
+    def render(short=False, shorter=False):
+        return "word " * (10 if shorter else 50 if short else 100)
+
+    steps = [("short", {"short": True}), ("shorter", {"shorter": True}), ("unused", {"short": False})]
+    prompt = fit_to_budget(render, steps, budget=20)
+    assert prompt.compactions == ("short", "shorter")
+    assert prompt.tokens == count_tokens(prompt) <= 20
+    assert not prompt.over_budget
+
+
+def test_no_budget_means_no_compaction():
+    prompt = fit_to_budget(lambda **options: "x " * 500, [("short", {})], budget=0)
+    assert prompt.compactions == ()
+    assert not prompt.over_budget
+
+
+def test_history_steps_halve_down_to_the_floor():
+    assert [name for name, _ in history_steps([{}] * 7)] == ["history:3", "history:1", "history:0"]
+    assert [name for name, _ in history_steps([{}] * 7, floor=2)] == ["history:3", "history:2"]
+
+
+def test_dinner_prompt_compacts_history_then_notes_then_grouping():
+    prompt = ai.build_dinner_prompt(PROFILE, FOOD_PREFS, HISTORY, budget=1)
+    assert prompt.compactions == ("history:3", "history:1", "history:0", "notes", "group")
+
+
+def test_allergies_and_medical_notes_are_never_cut():
+    prompt = ai.build_dinner_prompt(PROFILE, FOOD_PREFS, HISTORY, budget=1)
+    assert prompt.over_budget
+    assert "allergy: Shellfish, Peanuts" in prompt
+    assert PROFILE["medical_notes"] in prompt
@@ -0,0 +1,59 @@
+"""
+Tests for the SQLite-backed Gemini response cache.
+Run with: python -m pytest -q
+"""
+
+import response_cache
+from response_cache import ResponseCache, prompt_fingerprint
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(monkeypatch, **kwargs) -> tuple[ResponseCache, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    return ResponseCache(":memory:", **kwargs), clock
+
+
+def test_fingerprint_ignores_whitespace_and_case():
+    assert prompt_fingerprint("workout", "m", "Hello   World\n") == prompt_fingerprint("workout", "m", "hello world")
+    assert prompt_fingerprint("workout", "m", "hello") != prompt_fingerprint("dinner", "m", "hello")
+
+
+def test_entries_expire_after_their_kinds_ttl(monkeypatch):
+    cache, clock = make_cache(monkeypatch, ttls={"workout": 60, "recipe": 600})
+    cache.put("w", "workout", "squats")
+    cache.put("r", "recipe", "salmon")
+    clock.now += 61
+    assert cache.get("w", "workout") is None
+    assert cache.get("r", "recipe") == "salmon"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_kinds_with_zero_ttl_are_never_stored(monkeypatch):
+    cache, _ = make_cache(monkeypatch)
+    cache.put("v", "vibe", "you've got this")
+    assert cache.get("v", "vibe") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used_past_max_entries(monkeypatch):
+    cache, clock = make_cache(monkeypatch, max_entries=2)
+    cache.put("a", "workout", "A")
+    clock.now += 1
+    cache.put("b", "workout", "B")
+    clock.now += 1
+    assert cache.get("a", "workout") == "A"  # Now "b" is the least recently used
+    clock.now += 1
+    cache.put("c", "workout", "C")
+    assert cache.get("b", "workout") is None
+    assert cache.get("a", "workout") == "A"
+    assert cache.get("c", "workout") == "C"
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,46 @@
+"""
+Tests for settings.py.
+Run with: python -m pytest -q
+"""
+
+import threading
+
+from settings import get_setting, process_wide
+
+
+def test_get_setting_reads_and_casts_environment(monkeypatch):
+    monkeypatch.setenv("FITFLOW_TEST_NUMBER", "4")
+    monkeypatch.setenv("FITFLOW_TEST_FLAG", "Yes")
+    assert get_setting("FITFLOW_TEST_NUMBER", 1, int) == 4
+    assert get_setting("FITFLOW_TEST_FLAG", False, bool) is True
+    assert get_setting("FITFLOW_TEST_MISSING", "default") == "default"
+
+
+def test_process_wide_builds_once_across_threads():
+    built = []
+
+    @process_wide
+    def get_thing():
+        built.append(object())
+        return built[-1]
+
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(get_thing())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(built) == 1
+    assert all(thing is built[0] for thing in seen)
+
+
+def test_process_wide_keys_by_arguments_and_evicts_oldest():
+    @process_wide(max_entries=2)
+    def build(name):
+        return object()
+
+    a = build("a")
+    assert build("a") is a
+    build("b")
+    build("c")
+    assert build("a") is not a
@@ -0,0 +1,55 @@
+"""
+Tests for similarity.py.
+Run with: python -m pytest -q
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import similarity
+from similarity import SimilarityIndex, estimate_similarity, features, signature
+from summaries import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUMMARY = {"exercises": ["goblet squat", "plank", "push-ups"]}
+
+
+def test_signatures_match_across_processes():
+    code = (
+        "from similarity import features, signature; "
+        f"print(list(signature(features('workout', {SUMMARY!r}))))"
+    )
+    outputs = {
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": seed}, cwd=ROOT,
+        ).stdout
+        for seed in ("1", "2")
+    }
+    assert len(outputs) == 1
+    assert outputs.pop().strip() == str(list(signature(features("workout", SUMMARY))))
+
+
+def test_identical_summaries_score_one():
+    sig = signature(features("workout", SUMMARY))
+    assert estimate_similarity(sig, sig) == 1.0
+
+
+def test_rename_moves_a_users_signatures():
+    index = SimilarityIndex()
+    history = [{"workout_summary": SUMMARY}]
+    text = "- **Goblet squat**: 3 x 12\n- **Plank**: 3 x 30s\n- **Push-ups**: 3 x 10"
+    before = index.score("Ashley", "workout", text, history)
+    index.rename("Ashley", "Ash")
+    assert index.score("Ash", "workout", text, []) == before
+    assert index.score("Ashley", "workout", text, []) == 0.0
+
+
+def test_exact_repeat_skips_the_minhash_index(monkeypatch):
+    text = "- **Goblet squat**: 3 x 12\n- **Plank**: 3 x 30s\n- **Push-ups**: 3 x 10"
+    history = [{"workout_summary": summarize("workout", text)}]
+    monkeypatch.setattr(similarity.SimilarityIndex, "score", lambda *a: pytest.fail("scored an exact repeat"))
+    assert similarity.repeat_score("Ashley", "workout", text, history) == 1.0
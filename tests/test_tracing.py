@@ -0,0 +1,69 @@
+"""
+Tests for tracing.py.
+Run with: python -m pytest -q
+"""
+
+import json
+
+import tracing
+from tracing import SpanExporter, collect_spans, span, summarize_spans, traced
+
+
+@traced("equipment_inventory")
+def add_items(items):
+    return list(items)
+
+
+@traced("equipment_inventory")
+def add_item(item):
+    return add_items([item])[0]
+
+
+def test_nested_db_calls_count_once():
+    spans = collect_spans()
+    add_item({"name": "Kettlebell"})
+    add_items([{"name": "Jump rope"}, {"name": "Foam roller"}])
+    assert [s["nested"] for s in spans] == [True, False, False]
+    totals = {t["name"]: t for t in summarize_spans(spans)}
+    assert totals["db.add_item"]["calls"] == 1
+    assert totals["db.add_items"]["calls"] == 1
+    assert totals["db.add_items"]["rows"] == 2
+
+
+def test_exporter_creates_the_directory_for_its_file(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = SpanExporter(jsonl_path=str(path))
+    exporter.export({"name": "db.add_item", "start": 0.0, "duration_ms": 1.0})
+    assert json.loads(path.read_text())["name"] == "db.add_item"
+
+
+def test_exporter_turns_off_file_export_if_it_cant_open(tmp_path):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    exporter = SpanExporter(jsonl_path=str(blocker / "spans.jsonl"))
+    assert exporter.file_error is not None
+    exporter.export({"name": "db.add_item", "start": 0.0, "duration_ms": 1.0})
+
+
+def test_failing_listener_does_not_skip_export(monkeypatch):
+    exported = []
+
+    class Recorder:
+        def export(self, record):
+            exported.append(record["name"])
+
+    def broken_listener(record):
+        raise RuntimeError("listener bug")
+
+    monkeypatch.setattr(tracing, "get_exporter", Recorder)
+    monkeypatch.setattr(tracing, "_listeners", [broken_listener])
+    with span("gemini.workout"):
+        pass
+    assert exported == ["gemini.workout"]
+
+
+def test_fragment_spans_are_not_counted_as_calls():
+    spans = collect_spans()
+    with span("fragment.equipment_list"):
+        add_item({"name": "Kettlebell"})
+    assert [t["name"] for t in summarize_spans(spans)] == ["db.add_item"]
@@ -0,0 +1,220 @@
+"""
+Lightweight tracing for the FitFlow Health App.
+Records a span (a plain dict) for every db.py call, Gemini request and app
+fragment run: its duration, table or prompt kind, row and token counts,
+retries, error class, and the names of the spans it ran inside. Spans can be appended to a JSON-lines file, sent to OpenTelemetry,
+and collected per Streamlit rerun for the admin panel.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from settings import get_setting, process_wide
+
+# Span currently open in this context (for record_error)
+_current = contextvars.ContextVar("fitflow_current_span", default=None)
+# List that this rerun's finished spans are appended to, if any
+_collector = contextvars.ContextVar("fitflow_span_collector", default=None)
+# Callables that see every finished span in the process (see add_listener)
+_listeners = []
+
+
+class SpanExporter:
+    """Writes finished spans to a JSON-lines file and/or OpenTelemetry.
+
+    If the file can't be opened or written, JSON-lines export is turned off
+    for the rest of the process (see `file_error`) rather than retried per span.
+    """
+
+    def __init__(self, jsonl_path: str | None = None, otel: bool = False):
+        self._lock = threading.Lock()
+        self._file = None
+        self.file_error = None
+        if jsonl_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+                self._file = open(jsonl_path, "a", buffering=1)
+            except OSError as e:
+                self.file_error = e
+        self._otel = None
+        if otel:
+            try:
+                from opentelemetry import trace
+            except ImportError:
+                pass  # opentelemetry-api not installed — JSON lines only
+            else:
+                self._otel = trace.get_tracer("fitflow")
+
+    def export(self, span: dict):
+        if self._file:
+            with self._lock:
+                try:
+                    self._file.write(json.dumps(span, default=str) + "\n")
+                except OSError as e:
+                    self.file_error = e
+                    self._file.close()
+                    self._file = None
+        if self._otel:
+            end_ns = int((span["start"] + span["duration_ms"] / 1000) * 1e9)
+            attributes = {
+                k: v for k, v in span.items()
+                if k not in ("name", "start", "duration_ms") and isinstance(v, (str, int, float, bool))
+            }
+            otel_span = self._otel.start_span(
+                span["name"], start_time=int(span["start"] * 1e9), attributes=attributes
+            )
+            otel_span.end(end_time=end_ns)
+
+
+@process_wide
+def get_exporter() -> SpanExporter:
+    """Return the span exporter configured by TRACE_JSONL_PATH and TRACE_OTEL."""
+    return SpanExporter(
+        jsonl_path=get_setting("TRACE_JSONL_PATH"),
+        otel=get_setting("TRACE_OTEL", False, bool),
+    )
+
+
+# ─── Spans ───────────────────────────────────────────────────────────
+
+def start_span(name: str, **attrs) -> dict:
+    """Open a span. Pair with end_span(); prefer `span()` outside generators."""
+    parent = _current.get()
+    return {
+        "name": name,
+        **attrs,
+        "error": None,
+        "parents": (*parent["parents"], parent["name"]) if parent else (),
+        "thread": threading.current_thread().name,
+        "start": time.time(),
+        "_t0": time.perf_counter(),
+        "_sink": _collector.get(),
+    }
+
+
+def end_span(record: dict):
+    """Close a span and hand it to the exporter and this rerun's collector."""
+    record["duration_ms"] = (time.perf_counter() - record.pop("_t0")) * 1000
+    sink = record.pop("_sink")
+    if sink is not None:
+        sink.append(record)
+    # Tracing must never break the app, and one failing consumer mustn't starve the rest
+    for listener in list(_listeners):
+        try:
+            listener(record)
+        except Exception:
+            pass
+    try:
+        get_exporter().export(record)
+    except Exception:
+        pass
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time the enclosed block as a span; yields the span dict for extra fields."""
+    record = start_span(name, **attrs)
+    token = _current.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        end_span(record)
+
+
+def current_span() -> dict | None:
+    """The span currently open in this context, if any."""
+    return _current.get()
+
+
+def annotate(**fields):
+    """Add fields to the span currently open in this context, if any."""
+    record = _current.get()
+    if record is not None:
+        record.update(fields)
+
+
+def record_error(error: Exception):
+    """Note an error on the current span even though the caller handles it."""
+    annotate(error=type(error).__name__)
+
+
+def _row_count(result) -> int:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1 if result else 0
+    return 0
+
+
+def traced(table: str):
+    """Wrap a db.py function in a "db.<function>" span tagged with its table.
+
+    A call made from inside another db.py call (e.g. add_equipment ->
+    add_equipment_items) is marked nested, and left out of the totals.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            nested = parent is not None and parent["name"].startswith("db.")
+            with span(f"db.{fn.__name__}", table=table, nested=nested) as record:
+                result = fn(*args, **kwargs)
+                record["rows"] = _row_count(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def add_listener(listener):
+    """Call `listener(span)` for every span finished anywhere in the process.
+
+    For offline tools like benchmark.py, which can't see the script
+    thread's per-rerun collector.
+    """
+    _listeners.append(listener)
+
+
+# ─── Per-Rerun Collection ────────────────────────────────────────────
+
+def collect_spans() -> list[dict]:
+    """Start collecting this context's spans into a new list and return it.
+
+    Call at the top of each script run; worker threads see it too if they
+    run in a copy of the context (see ai.generate_my_day).
+    """
+    spans = []
+    _collector.set(spans)
+    return spans
+
+
+def summarize_spans(spans: list[dict]) -> list[dict]:
+    """Totals per span name: calls, time, rows, tokens, retries and errors.
+
+    Nested db spans and fragment spans are skipped: their time is already
+    in the outer call's, or made up of the calls inside them.
+    """
+    totals = {}
+    for s in list(spans):
+        if s.get("nested") or s["name"].startswith("fragment."):
+            continue
+        t = totals.setdefault(s["name"], {
+            "name": s["name"], "calls": 0, "ms": 0.0, "rows": 0,
+            "prompt_tokens": 0, "response_tokens": 0, "retries": 0, "errors": 0,
+        })
+        t["calls"] += 1
+        t["ms"] += s.get("duration_ms", 0.0)
+        t["rows"] += s.get("rows", 0)
+        t["prompt_tokens"] += s.get("prompt_tokens", 0)
+        t["response_tokens"] += s.get("response_tokens", 0)
+        t["retries"] += s.get("retries", 0)
+        t["errors"] += bool(s.get("error"))
+    return sorted(totals.values(), key=lambda t: t["ms"], reverse=True)